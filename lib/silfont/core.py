@@ -9,7 +9,12 @@ __version__ = '1.3.1.dev0'
 
 from glob import glob
 #import re, sys, os, codecs, argparse, datetime, shutil, csv, copy, ConfigParser
-import sys, os, argparse, datetime, shutil, csv, ConfigParser, codecs
+import sys, os, argparse, datetime, shutil, csv, codecs, time, collections
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
 
 class loggerobj(object):
     # For handling log messages.
@@ -66,6 +71,57 @@ class loggerobj(object):
         self.scrlevel = self._basescrlevel
 
 
+def maxrss():  # Peak memory use of the process in KB, or None if not available
+    if resource is None: return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # Reported in bytes on macOS
+
+
+class timerobj(object):
+    # For recording elapsed time and peak memory use for each phase of a script run.
+    # Phases can be nested, eg layers are parsed within opening a font, and are reported in the order they started
+
+    def __init__(self):
+        self.starttime = time.time()
+        self.phases = []  # [name, depth, elapsed, maxrss] for each phase
+        self.depth = 0
+
+    def start(self, name):
+        phase = [name, self.depth, time.time(), None]
+        self.phases.append(phase)
+        self.depth += 1
+        return phase
+
+    def stop(self, phase):
+        self.depth -= 1
+        phase[2] = time.time() - phase[2]
+        phase[3] = maxrss()
+
+    @contextmanager
+    def phase(self, name):
+        phase = self.start(name)
+        try:
+            yield phase
+        finally:
+            self.stop(phase)
+
+    def report(self, logger, level):
+        for (name, depth, elapsed, rss) in self.phases:
+            message = "Timing: " + "  " * depth + name + " {:.3f}s".format(elapsed)
+            if rss is not None: message += ", peak memory " + str(rss) + " KB"
+            logger.log(message, level)
+        logger.log("Timing: total {:.3f}s".format(time.time() - self.starttime), level)
+
+    def dump(self, filename, info):  # Write timings as json, along with info dict describing the run
+        data = dict(info)
+        data["total"] = time.time() - self.starttime
+        data["maxrss"] = maxrss()
+        data["phases"] = [{"name": name, "depth": depth, "elapsed": elapsed, "maxrss": rss} for (name, depth, elapsed, rss) in self.phases]
+        import json
+        with open(filename, "w") as outfile:
+            json.dump(data, outfile, indent=2, sort_keys=True)
+
+
 class parameters(object):
     # Object for holding parameters information, organised by class (eg logging)
 
@@ -78,7 +134,7 @@ class parameters(object):
         defparams = {}
         defparams['system'] = {'version': __version__, 'copyright': __copyright__}  # Code treats these as read-only
         defparams['logging'] = {'scrlevel': 'P', 'loglevel': 'W'}
-        defparams['backups'] = {'backup': True, 'backupdir': 'backups', 'backupkeep': 5}
+        defparams['backups'] = {'backup': True, 'backupdir': 'backups', 'backupkeep': 5, 'backupmode': 'copy'}
         # Default parameters for UFO module
         defparams['outparams'] = {
             "indentIncr":       "  ",   # XML Indent increment
@@ -98,12 +154,23 @@ class parameters(object):
         defparams['ufometadata'] = {
             "checkfix":         "check"   # Apply metadata fixes when reading UFOs
         }
+        defparams['performance'] = {
+            "workers":          1,        # Number of workers for reading and writing UFO glifs
+            "maxopen":          0,        # Maximum number of glif files open at once by workers (0 for no limit)
+            "xmlparser":        "auto",   # Parser for glifs that are only scanned: lxml, etree or auto to use lxml if installed
+            "cache":            "off",    # Cache scanned glif data and a manifest of files written, between runs
+            "cachedir":         "backups",# Directory for cache files, relative to the font's parent directory
+            "timing":           "",       # Log level (eg P or I) for reporting time and memory use of each phase of a script run
+            "timingfile":       "",       # File to write timings to as json
+            "profile":          ""        # File to write cProfile stats to
+        }
 
         self.classes = {}  # Dictionary containing a list of parameters in each class
         self.paramclass = {}  # Dictionary of class name for each parameter name
         self.types = {}  # Python type for each parameter deduced from initial values supplied
         self.listtypes = {}  # If type is dict, the type of values in the dict
         self.logger = loggerobj()
+        self.timer = timerobj()  # Records time and memory use of phases of a script run
         defset = _paramset(self, "default", "defaults")
         self.sets = {"default": defset}
         self.lcase = {}  # Lower case index of parameters names
@@ -124,6 +191,7 @@ class parameters(object):
         # sourcedesc should be added for user-supplied data (eg config file) for reporting purposes
         dict = {}
         if configfile:
+            import ConfigParser
             config = ConfigParser.ConfigParser()
             config.readfp(open(configfile))
             if sourcedesc is None: sourcedesc = configfile
@@ -240,6 +308,21 @@ class csvreader(object):    # Iterator for csv files, skipping comments and chec
                 continue
             yield row
 
+    def mapping(self, keycol=0, valcol=1):
+        # Read the remaining rows into an OrderedDict keyed on the keycol field, so scripts can check the data against
+        # the font then apply it in bulk.  Values are the valcol field, or with valcol=None, a list of all the other fields.
+        # Rows with a key already seen are logged and ignored.  self.keylines gives the line number for each key
+        data = collections.OrderedDict()
+        self.keylines = {}
+        for row in self:
+            key = row[keycol]
+            if key in data:
+                self.logger.log("Duplicate entry for " + key + " on line " + str(self.line_num) + "; ignored", "E")
+                continue
+            data[key] = row[valcol] if valcol is not None else row[:keycol] + row[keycol+1:]
+            self.keylines[key] = self.line_num
+        return data
+
 
 def execute(tool, fn, argspec, chain = None):
     # Function to handle parameter parsing, font and file opening etc in command-line scripts
@@ -260,6 +343,7 @@ def execute(tool, fn, argspec, chain = None):
     params = chain["params"] if chain else parameters()
     logger = chain["logger"] if chain else params.logger  # paramset has already created a basic logger
     argv   = chain["argv"]   if chain else sys.argv
+    timer  = params.timer
 
     if tool == "FF":
         import fontforge
@@ -267,10 +351,8 @@ def execute(tool, fn, argspec, chain = None):
             return  # Execute is for command-line use
         fontforge.loadPrefs()
         fontforge.setPrefs("PreserveTables", "DSIG,Feat,Glat,Gloc,LTSH,Silf,Sill,Silt,VDMX,hdmx")  ## Perhaps should be a parameter and check for existing values
-    elif tool == "UFO":
-        from silfont.ufo import Ufont
-    elif tool == "FT":
-        from fontTools import ttLib
+    elif tool in ("UFO", "FT"):
+        pass  # Imported once arguments are parsed, so -h does not have to load them
     elif tool == "" or tool is None:
         tool = None
     else:
@@ -356,12 +438,15 @@ def execute(tool, fn, argspec, chain = None):
 
     # Parse the command-line arguments. If errors or -h used, procedure will exit here
     args = parser.parse_args(argv[1:])
+    if tool == "UFO": from silfont.ufo import Ufont
+    if tool == "FT": from fontTools import ttLib
 
     # Process the first positional parameter to get defaults for file names
     fppval = getattr(args, arginfo[0]['name'])
     if fppval is None: fppval = ""  # For scripts that can be run with no positional parameters
     (fppath, fpbase, fpext) = splitfn(fppval)  # First pos param use for defaulting
 
+    configphase = timer.start("config " + poptions['prog'])
     # Process parameters
     if chain:
         execparams = params.sets["main"]
@@ -396,6 +481,13 @@ def execute(tool, fn, argspec, chain = None):
         params.sets["main"].updatewith("command line")
         execparams = params.sets["main"]
 
+    # Batch mode - if the input font is a glob pattern or designspace file, run the script separately for each font
+    if not chain and arginfo[0].get('type') == 'infont':
+        fontlist = batchfonts(fppval)
+        if fontlist is not None:
+            runbatch(tool, fn, argspec, argv, fppval, fontlist, arginfo, args, execparams, logger)
+            return (args, None)
+
     # Set up logging
     if chain:
         setattr(args, 'logger', logger)
@@ -440,6 +532,19 @@ def execute(tool, fn, argspec, chain = None):
         logger.logfile = logfile
         setattr(args, 'logger', logger)
 
+    # Set up timing and profiling.  When chaining, these are handled by the first script
+    if not chain:
+        timing = execparams['timing'].upper()
+        if timing in ("", "OFF"):
+            timing = None
+        elif timing not in logger.loglevels or timing in ("X", "S"):
+            logger.log("Invalid value '" + execparams['timing'] + "' for timing parameter", "S")
+        profiler = None
+        if execparams['profile']:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
 # Process the argument values returned from argparse
 
     outfont = None
@@ -493,7 +598,7 @@ def execute(tool, fn, argspec, chain = None):
         if atype == 'infont':
             if tool is None:
                 logger.log("Can't specify a font without a font tool", "X")
-            infontlist.append((ainfo['name'], aval))  # Build list of fonts to open when other args processed
+            infontlist.append((ainfo['name'], aval, ainfo))  # Build list of fonts to open when other args processed
         elif atype == 'infile':
             logger.log('Opening file for input: '+aval, "P")
             try:
@@ -535,21 +640,26 @@ def execute(tool, fn, argspec, chain = None):
 
         setattr(args, ainfo['name'], aval)
 
+    timer.stop(configphase)
+
 # Open fonts - needs to be done after processing other arguments so logger and params are defined
 
-    for name, aval in infontlist:
-        if chain and name == 'ifont':
+    for name, aval, ainfo in infontlist:
+        if chain and name == arginfo[0]['name']:  # The chained font is used in place of the first positional parameter
+            if ainfo.get('scan', False): logger.log(poptions['prog'] + " can't be chained since it opens fonts in scan mode", "S")
             aval = chain["font"]
         else:
-            if tool == "FF" : aval = fontforge.open(aval)
-            if tool == "UFO": aval = Ufont(aval, params=params)
-            if tool == "FT" : aval = ttLib.TTFont(aval)
+            with timer.phase("open " + aval):
+                if tool == "FF" : aval = fontforge.open(aval)
+                if tool == "UFO": aval = Ufont(aval, params=params, lazy=ainfo.get('lazy', False), scan=ainfo.get('scan', False))
+                if tool == "FT" : aval = ttLib.TTFont(aval)
         setattr(args, name, aval)  # Assign the font object to args attribute
 
 # All arguments processed, now call the main function
     setattr(args, "paramsobj", params)
     setattr(args, "cmdlineargs", argv)
-    newfont = fn(args)
+    with timer.phase("script " + poptions['prog']):
+        newfont = fn(args)
 # If an output font is expected and one is returned, output the font
     if chainfirst: chain = True # Special handling for first call of chaining
     if newfont:
@@ -562,6 +672,8 @@ def execute(tool, fn, argspec, chain = None):
                     backupdir = os.path.join(outfontpath, execparams['backupdir'])
                     backupmax = int(execparams['backupkeep'])
                     backup = str2bool(execparams['backup'])
+                    backupmode = execparams['backupmode'].lower()
+                    if backupmode not in ("copy", "link"): logger.log("backupmode must be copy or link", "S")
 
                     if backup:
                         if not os.path.isdir(backupdir):  # Create backup directory if not present
@@ -576,16 +688,22 @@ def execute(tool, fn, argspec, chain = None):
                         newnum = max(nums)+1 if nums else 1
                         backupname = backupbase+"."+str(newnum)+"~"
                         # Backup the font
-                        newfont.logger.log("Backing up input font to "+backupname, "P")
-                        shutil.copytree(outfont, backupname)
-                        # Purge old backups
-                        for i in range(0, len(nums) - backupmax + 1):
-                            backupname = backupbase+"."+str(nums[i])+"~"
-                            newfont.logger.log("Purging old backup "+backupname, "I")
-                            shutil.rmtree(backupname)
+                        with timer.phase("backup"):
+                            newfont.logger.log("Backing up input font to "+backupname, "P")
+                            if backupmode == "link" and nums:  # Hard link files unchanged since the previous backup
+                                counts = linkcopytree(outfont, backupname, backupbase+"."+str(nums[-1])+"~")
+                                newfont.logger.log("%d files copied and %d linked to the previous backup" % counts, "I")
+                            else:
+                                shutil.copytree(outfont, backupname)
+                            # Purge old backups
+                            for i in range(0, len(nums) - backupmax + 1):
+                                backupname = backupbase+"."+str(nums[i])+"~"
+                                newfont.logger.log("Purging old backup "+backupname, "I")
+                                shutil.rmtree(backupname)
                     else:
                         newfont.logger.log("No font backup done due to backup parameter setting", "W")
                 # Output the font
+                writephase = timer.start("write " + outfont)
                 if tool == "FF":
                     logger.log("Saving font to " + outfont, "P")
                     if outfontext.lower() == ".ufo" or outfontext.lower() == '.ttf':
@@ -596,11 +714,22 @@ def execute(tool, fn, argspec, chain = None):
                     newfont.save(outfont)
                 else:  # Must be Pyslifont Ufont
                     newfont.write(outfont)
+                timer.stop(writephase)
             else:
                 logger.log("Font returned to execute() but no output font is specified in arg spec", "X")
     elif chain:             # When chaining return just args - the font can be accessed by args.ifont
         return (args, None) # assuming that the script has not changed the input font
 
+    # Report timings and save profile
+    if profiler:
+        profiler.disable()
+        logger.log("Writing profile stats to " + execparams['profile'], "P")
+        profiler.dump_stats(execparams['profile'])
+    if timing: timer.report(logger, timing)
+    if execparams['timingfile']:
+        logger.log("Writing timings to " + execparams['timingfile'], "P")
+        timer.dump(execparams['timingfile'], {"script": poptions['prog'], "argv": argv[1:], "version": __version__})
+
     if logger.errorcount or logger.warningcount:
         message = "Command completed with " + str(logger.errorcount) + " errors and " + str(logger.warningcount) + " warnings"
         if logger.scrlevel in ("S", "E") and logname is not "":
@@ -618,21 +747,131 @@ def execute(tool, fn, argspec, chain = None):
     return (args, newfont)
 
 
+def batchfonts(fontspec):
+    # Returns a list of fonts if fontspec is a glob pattern or designspace file, otherwise None
+    if fontspec.lower().endswith(".designspace"):
+        from xml.etree import cElementTree as ET
+        try:
+            sources = ET.parse(fontspec).getroot().findall("sources/source")
+        except Exception as e:
+            print(e)
+            sys.exit(1)
+        fonts = []
+        for source in sources:  # Layer sources can mean the same font is listed more than once
+            fontn = os.path.join(os.path.dirname(fontspec), source.get("filename"))
+            if fontn not in fonts: fonts.append(fontn)
+        return fonts
+    if any(c in fontspec for c in "*?["):
+        return sorted(glob(fontspec))
+    return None
+
+
+def runbatch(tool, fn, argspec, argv, fontspec, fontlist, arginfo, args, execparams, logger):
+    # Run the script for each font in a pool of processes, each with its own parameters and logger.  Output from each
+    # run is displayed together once it has completed, then a summary of errors and warnings is given
+    import multiprocessing
+    if not fontlist: logger.log("No fonts found matching " + fontspec, "S")
+    # An output font can only be given as a suffix starting with _, eg _subset.ufo, which is added to each font's name
+    outfontsuffix = None
+    for ainfo in arginfo[1:]:
+        outfontsuffix = getattr(args, ainfo['name']) if ainfo.get('type') == 'outfont' else None
+        if outfontsuffix:
+            if outfontsuffix[0] != "_" or os.path.dirname(outfontsuffix):
+                logger.log("Output font must be a suffix starting with _ when running against multiple fonts", "S")
+            break
+    workers = int(execparams['workers'])
+    if workers < 1: logger.log("workers must be at least 1", "S")
+    logger.log("Running " + splitfn(argv[0])[1] + " against " + str(len(fontlist)) + " fonts with " + str(workers) + " workers", "P")
+    # Each font is processed in a new process.  Pools can't be nested, so workers is set to 1 within each
+    jobs = []
+    for fontn in fontlist:
+        jobargv = list(argv)
+        jobargv[argv.index(fontspec, 1)] = fontn
+        if outfontsuffix:
+            (path, base, ext) = splitfn(fontn)
+            jobargv[argv.index(outfontsuffix, 1)] = os.path.join(path, base + outfontsuffix)
+        jobs.append((tool, fn, argspec, jobargv + ["-p", "workers=1"]))
+    pool = multiprocessing.Pool(min(workers, len(jobs)), maxtasksperchild=1)
+    failed = []
+    (errors, warnings) = (0, 0)
+    try:
+        for fontn, (output, status, errorcount, warningcount) in zip(fontlist, pool.imap(_batchjob, jobs)):
+            if output: print("\n==== " + fontn + " ====\n" + output, end="")
+            if status:
+                failed.append(fontn)
+            else:
+                errors += errorcount
+                warnings += warningcount
+    finally:
+        pool.close()
+        pool.join()
+    message = "Batch completed for " + str(len(fontlist) - len(failed)) + " of " + str(len(fontlist)) + " fonts with " + \
+              str(errors) + " errors and " + str(warnings) + " warnings"
+    print()
+    if failed: logger.log("Failed for: " + ", ".join(failed), "E")
+    logger.log(message, "E" if errors or failed else "P")
+    if failed: sys.exit(1)
+
+
+def _batchjob(job):
+    # Run by the pool in runbatch() to run a script for one font, capturing the screen output
+    # Returns (output, exit status, error count, warning count)
+    import StringIO, traceback
+    (tool, fn, argspec, argv) = job
+    sys.argv = argv
+    sys.stdout = StringIO.StringIO()
+    (status, errorcount, warningcount) = (0, 0, 0)
+    try:
+        (args, font) = execute(tool, fn, argspec)
+        if args.logger:
+            (errorcount, warningcount) = (args.logger.errorcount, args.logger.warningcount)
+    except SystemExit as e:
+        status = e.code if e.code is not None else 0
+    except BaseException:
+        traceback.print_exc(file=sys.stdout)
+        status = 1
+    return (sys.stdout.getvalue(), status, errorcount, warningcount)
+
+
 def chain(argv, function, argspec, font, params, logger, quiet):  # Chain multple command-line scripts using UFO module together without writing font to disk
     ''' argv is a command-line call to a script in sys.argv format.  function and argspec are from the script being called.
     Although input font name must be supplied for the command line to be parsed correctly by execute() it is not used - instead the supplied
-    font object is used. Similarly -params, logfile and quiet settings in argv are not used by execute() when chaining is used'''
+    font object is used. Similarly -params, logfile and quiet settings in argv are not used by execute() when chaining is used.
+    Returns the font returned by the function or, if it returns None, the supplied font'''
     if quiet and "-q" not in argv: argv.append("-q")
     logger.log("Chaining to " + argv[0], "P")
-    font = execute("UFO", function, argspec, 
+    (args, newfont) = execute("UFO", function, argspec,
         {'argv' : argv, 
             'font'  : font,
             'params': params,
             'logger': logger,
             'quiet' : quiet})
     logger.log("Returning from " + argv[0], "P")
-    return font
-
+    return newfont if newfont else font
+
+
+def linkcopytree(src, dst, linkdest):
+    # Copy src to dst like shutil.copytree(), except that files which are unchanged (by size and mtime) from the same
+    # file under linkdest are hard linked to that rather than copied, as with rsync --link-dest.  Files are copied if
+    # hard links can't be made.  Returns counts of files (copied, linked)
+    if os.path.isdir(src):
+        os.mkdir(dst)
+        counts = (0, 0)
+        for name in os.listdir(src):
+            (copied, linked) = linkcopytree(os.path.join(src, name), os.path.join(dst, name), os.path.join(linkdest, name))
+            counts = (counts[0] + copied, counts[1] + linked)
+        shutil.copystat(src, dst)
+        return counts
+    if os.path.isfile(linkdest):
+        (sstat, lstat) = (os.stat(src), os.stat(linkdest))
+        if sstat.st_size == lstat.st_size and abs(sstat.st_mtime - lstat.st_mtime) < 0.00001:  # copy2() keeps mtime to 1us
+            try:
+                os.link(linkdest, dst)
+                return (0, 1)
+            except (OSError, AttributeError):  # eg file system without hard links, or os.link() missing on Windows
+                pass
+    shutil.copy2(src, dst)
+    return (1, 0)
 
 def splitfn(fn):  # Split filename into path, base and extension
     if fn:  # Remove trailing slashes
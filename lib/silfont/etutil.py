@@ -6,10 +6,10 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'David Raymond'
 
 from xml.etree import cElementTree as ET
-from glob import glob
 import silfont.core
+import silfont.util as UT
 
-import re, sys, os, codecs, argparse, datetime, shutil, csv, collections
+import re, sys, os, collections, threading
 
 _elementprotect = {
     '&' : '&amp;',
@@ -35,70 +35,83 @@ class ETWriter(object) :
         self.inlineelem = inlineelem            # For supporting in-line elements.  Does not work with mix of inline and other subelements in same element
         self.precision = precision              # Precision to use outputting numeric attribute values
         self.numAttribs = numAttribs            # List of numeric attributes used with precision
+        attribOrder = self.attributeOrder
+        self._attribkey = lambda x: (attribOrder.get(x, 999), x)  # Sort key for attribute names
+        self._attribcache = {}
 
     def _protect(self, txt, base=_attribprotect) :
         return re.sub(ur'['+ur"".join(base.keys())+ur"]", lambda m: base[m.group(0)], txt)
 
     def serialize_xml(self, write, base = None, indent = '') :
         """Output the object using write() in a normalised way:
-                If namespaces are used, use serialize_nsxml instead"""
-        outstr=""
+                If namespaces are used, use serialize_nsxml instead
+           The output is built up as a list of chunks and passed to write() in a single call"""
+        chunks = []
+        out = chunks.append
 
         if base is None :
             base = self.root
-            outstr += '<?xml version="1.0" encoding="UTF-8"?>\n'
+            out('<?xml version="1.0" encoding="UTF-8"?>\n')
             if '.pi' in base.attrib : # Processing instructions
-                for pi in base.attrib['.pi'].split(",") : outstr += u'<?{}?>\n'.format(pi)
+                for pi in base.attrib['.pi'].split(",") : out(u'<?{}?>\n'.format(pi))
 
-            if '.doctype' in base.attrib : outstr += u'<!DOCTYPE {}>\n'.format(base.attrib['.doctype'])
+            if '.doctype' in base.attrib : out(u'<!DOCTYPE {}>\n'.format(base.attrib['.doctype']))
 
+        self._serialize_elem(out, base, indent)
+        write(u"".join(chunks))
+
+    def _sortedattribs(self, attribs) :
+        # Returns the attribute names to output in order, excluding dummy attributes starting with '.'
+        # Elements of the same type nearly always have the same set of attributes, so orders are cached by key list
+        keys = tuple(attribs.keys())
+        order = self._attribcache.get(keys)
+        if order is None :
+            order = [k for k in sorted(keys, key=self._attribkey) if k[0] != '.']
+            self._attribcache[keys] = order
+        return order
+
+    def _serialize_elem(self, out, base, indent) :
         tag = base.tag
         attribs = base.attrib
+        inlineelem = self.inlineelem
 
         if '.comments' in attribs :
-            for c in attribs['.comments'].split(",") : outstr += u'{}<!--{}-->\n'.format(indent, c)
-
-        i = indent if tag not in self.inlineelem else ""
-        outstr += u'{}<{}'.format(i, tag)
-
-        for k in sorted(attribs.keys(), cmp=lambda x,y: cmp(self.attributeOrder.get(x, 999), self.attributeOrder.get(y, 999)) or cmp(x, y)) :
-            if k[0] != '.' :
-                att = attribs[k]
-                if self.precision is not None and k in self.numAttribs :
-                    num = round(float(attribs[k]), self.precision)
-                    att = "{}".format(int(num)) if num == int(num) else "{}".format(num)
-                outstr += u' {}="{}"'.format(k, att)
-
-        if len(base) or (base.text and base.text.strip()) :
-            outstr += '>'
-            if base.text and base.text.strip() :
+            for c in attribs['.comments'].split(",") : out(u'{}<!--{}-->\n'.format(indent, c))
+
+        out(u'{}<{}'.format(indent if tag not in inlineelem else "", tag))
+
+        precision = self.precision
+        for k in self._sortedattribs(attribs) :
+            att = attribs[k]
+            if precision is not None and k in self.numAttribs :
+                num = round(float(att), precision)
+                att = "{}".format(int(num)) if num == int(num) else "{}".format(num)
+            out(u' {}="{}"'.format(k, att))
+
+        text = base.text
+        hastext = text and text.strip()
+        if len(base) or hastext :
+            out('>')
+            if hastext :
                 if tag not in self.takesCData :
-                    t = base.text
-                    if self.indentML : t = t.replace('\n', '\n' + indent)
-                    t = self._protect(t, base=_elementprotect)
+                    if self.indentML : text = text.replace('\n', '\n' + indent)
+                    out(self._protect(text, base=_elementprotect))
                 else :
-                    t = "<![CDATA[\n\t" + indent + base.text.replace('\n', '\n\t' + indent) + "\n" + indent + "]]>"
-                outstr += t
+                    out("<![CDATA[\n\t" + indent + text.replace('\n', '\n\t' + indent) + "\n" + indent + "]]>")
             if len(base) :
-                if base[0].tag not in self.inlineelem : outstr += '\n'
-                if base == self.root:
-                    incr = self.indentFirst
-                else:
-                    incr = self.indentIncr
-                write(outstr); outstr=""
-                for b in base : self.serialize_xml(write, base=b, indent=indent + incr)
-                if base[-1].tag not in self.inlineelem : outstr += indent
-            outstr += '</{}>'.format(tag)
+                if base[0].tag not in inlineelem : out('\n')
+                subindent = indent + (self.indentFirst if base is self.root else self.indentIncr)
+                for b in base : self._serialize_elem(out, b, subindent)
+                if base[-1].tag not in inlineelem : out(indent)
+            out('</{}>'.format(tag))
         else :
-            outstr += '/>'
+            out('/>')
         if base.tail and base.tail.strip() :
-            outstr += self._protect(base.tail, base=_elementprotect)
-        if tag not in self.inlineelem : outstr += "\n"
+            out(self._protect(base.tail, base=_elementprotect))
+        if tag not in inlineelem : out("\n")
 
-        if '.commentsafter' in base.attrib :
-            for c in base.attrib['.commentsafter'].split(",") : outstr += u'{}<!--{}-->\n'.format(indent, c)
-
-        write(outstr)
+        if '.commentsafter' in attribs :
+            for c in attribs['.commentsafter'].split(",") : out(u'{}<!--{}-->\n'.format(indent, c))
 
     def _localisens(self, tag) :
         if tag[0] == '{' :
@@ -209,13 +222,16 @@ class _container(object) :
         return self._contents[key]
     def __iter__(self):
         return iter(self._contents)
+    def __contains__(self, key):  # Otherwise "in" would fall back to iterating through the keys
+        return key in self._contents
     def keys(self) :
         return self._contents.keys()
 
 class xmlitem(_container):
     """ The xml data item for an xml file"""
 
-    def __init__(self, dirn = None, filen = None, parse = True, logger=None) :
+    def __init__(self, dirn = None, filen = None, parse = True, logger=None, inxml=None) :
+        # inxml can be supplied as the result of readxml() for the file if it has already been read (eg by a worker pool)
         self.logger = logger if logger else silfont.core.loggerobj()
         self._contents = {}
         self.dirn = dirn
@@ -226,23 +242,17 @@ class xmlitem(_container):
         self.type = None
         if filen and dirn :
             fulln = os.path.join( dirn, filen)
-            with open(fulln, "r") as inxml:
-                for line in inxml.readlines() :
-                    self.inxmlstr = self.inxmlstr + line
-            if parse :
-                try:
-                    self.etree = ET.fromstring(self.inxmlstr)
-                except Exception as e:
-                    self.logger.log("Failed to parse xml for " + fulln, "E")
-                    self.logger.log(str(e), "S")
-
-    def write_to_xml(self,text) : # Used by ETWriter.serialize_xml()
+            if inxml is None : inxml = readxml(fulln, parse)
+            (self.inxmlstr, self.etree, error) = inxml
+            if error :
+                self.logger.log("Failed to parse xml for " + fulln, "E")
+                self.logger.log(error, "S")
+
+    def write_to_xml(self,text) : # Used by ETWriter.serialize_xml(), which supplies the whole xml string in one call
         self.outxmlstr = self.outxmlstr + text
 
     def write_to_file(self,dirn,filen) :
-        outfile=codecs.open(os.path.join(dirn,filen),'w','utf-8')
-        outfile.write(self.outxmlstr)
-        outfile.close
+        UT.writefile(os.path.join(dirn,filen), self.outxmlstr)
 
 class ETelement(_container):
     # Class for an etree element. Mainly used as a parent class
@@ -358,6 +368,69 @@ class ETelement(_container):
                 if multi and val == [] : self.parseerrors.append("No " + ename + " elements ")
                 if not multi and val == None : self.parseerrors.append("No " + ename + " element")
 
+def readxml(fulln, parse = True) : # Read and optionally parse an xml file, returning (xml string, etree, error message)
+    # Does no logging so can be used in worker threads; the caller should report any error
+    inxml = UT.readfile(fulln)
+    inxmlstr = inxml.decode("utf-8", "replace") # Only used for comparing with output xml, so invalid utf-8 just counts as changed
+    etree = None
+    error = None
+    if parse :
+        try:
+            etree = ET.fromstring(inxml) # Parsed from bytes so the xml declaration's encoding is used
+        except Exception as e:
+            error = str(e)
+    return (inxmlstr, etree, error)
+
+_readonlybackend = "auto" # Backend for parsereadonly(), set by setreadonlyparser()
+_readonlyparse = None # Function used by parsereadonly(), set up on its first call
+_readonlylocal = threading.local() # Holds an lxml parser for each thread, since lxml parsers can't be shared between threads
+
+def setreadonlyparser(backend = "auto") :
+    # Set the parser used by parsereadonly(): "etree" for cElementTree, "lxml" or "auto" to use lxml if it is installed.
+    # lxml is only imported when parsereadonly() is first called, except that if "lxml" is requested it is checked for
+    # now.  Returns False if lxml was requested but is not installed
+    global _readonlybackend, _readonlyparse
+    (_readonlybackend, _readonlyparse) = (backend, None)
+    if backend == "lxml" :
+        try :
+            import lxml.etree
+        except ImportError :
+            return False
+    return True
+
+def _setreadonlyparse() :
+    global _readonlyparse
+    parse = ET.fromstring
+    if _readonlybackend != "etree" :
+        try :
+            from lxml import etree as lxmletree
+        except ImportError :
+            lxmletree = None
+        if lxmletree is not None :
+            def parse(data) :
+                parser = getattr(_readonlylocal, "parser", None)
+                if parser is None : # Comments and processing instructions are dropped, as they are by cElementTree
+                    parser = _readonlylocal.parser = lxmletree.XMLParser(remove_comments=True, remove_pis=True)
+                return lxmletree.fromstring(data, parser)
+    _readonlyparse = parse
+
+def parsereadonly(data) :
+    # Parse xml bytes for code that only reads the resulting tree then discards it, such as ufo.scanGlif().  The tree
+    # may be an lxml one, so must not be passed to scripts or have cElementTree elements added to it
+    if _readonlyparse is None : _setreadonlyparse()
+    return _readonlyparse(data)
+
+def etreetotuple(element) : # Convert an element to nested (tag, attrib, text, tail, children) tuples, eg for pickling
+    return (element.tag, dict(element.attrib), element.text, element.tail, [etreetotuple(e) for e in element])
+
+def tupletoetree(tup) : # Reverse of etreetotuple()
+    (tag, attrib, text, tail, children) = tup
+    element = ET.Element(tag, attrib)
+    element.text = text
+    element.tail = tail
+    for child in children : element.append(tupletoetree(child))
+    return element
+
 def makeAttribOrder(attriblist) : # Turn a list of attrib names into an attributeOrder dict for ETWriter
         return dict(map(lambda x:(x[1], x[0]), enumerate(attriblist)))
 
@@ -7,7 +7,6 @@ __author__ = 'David Rowe'
 
 from xml.etree import cElementTree as ET
 from silfont.core import execute
-import silfont.ufo as ufo
 from silfont.comp import CompGlyph
 
 argspec = [
@@ -52,6 +51,7 @@ def addtwo(a1, a2):
     return b1 + b2
 
 def doit(args) :
+    import silfont.ufo as ufo
     global glyphlist
     infont = args.ifont
     if args.report: infont.logger.loglevel = args.report
@@ -6,9 +6,6 @@ __copyright__ = 'Copyright (c) 2017 SIL International  (http://www.sil.org)'
 __license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
 __author__ = 'Martin Hosken'
 
-from fontTools.feaLib.builder import Builder
-from fontTools import configLogger
-from fontTools.ttLib import TTFont
 
 from silfont.core import execute
 
@@ -24,7 +21,6 @@ def keepIndexBuilder(self, tag):
         lookups.append(lookup)
     return [l.build() for l in lookups]
 
-Builder.buildLookups_ = keepIndexBuilder
 #TODO: provide more argument info
 argspec = [
     ('input_fea', {'help': 'Input fea file'}, {}),
@@ -35,6 +31,10 @@ argspec = [
 ]
 
 def doit(args) :
+    from fontTools.feaLib.builder import Builder
+    from fontTools import configLogger
+    from fontTools.ttLib import TTFont
+    Builder.buildLookups_ = keepIndexBuilder
     levels = ["WARNING", "INFO", "DEBUG"]
     configLogger(level=levels[min(len(levels) - 1, args.verbose)])
 
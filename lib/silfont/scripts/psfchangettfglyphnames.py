@@ -11,7 +11,6 @@ __author__ = 'Alan Ward'
 # but I don't know exactly where in the UFO that is
 
 from silfont.core import execute
-import defcon, fontTools.ttLib, ufo2ft
 
 argspec = [
     ('iufo', {'help': 'Input UFO folder'}, {}),
@@ -19,6 +18,7 @@ argspec = [
     ('ottf', {'help': 'Output ttf file name'}, {})]
     
 def doit(args):
+    import defcon, fontTools.ttLib, ufo2ft
     ufo = defcon.Font(args.iufo)
     ttf = fontTools.ttLib.TTFont(args.ittf)
     
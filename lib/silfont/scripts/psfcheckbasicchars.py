@@ -10,7 +10,7 @@ __author__ = 'Victor Gaultney'
 from silfont.core import execute
 
 argspec = [
-    ('ifont',{'help': 'Input font file'}, {'type': 'infont'}),
+    ('ifont',{'help': 'Input font file'}, {'type': 'infont', 'scan': True}),
     ('-l','--log',{'help': 'Log file'}, {'type': 'outfile', 'def': '_checkbasicchars.log'})]
 
 basicchars = {
@@ -315,15 +315,14 @@ def doit(args) :
     font = args.ifont
     logger = args.logger
 
-    glyphlist = font.deflayer.keys()
+    layer = font.deflayer
 
-    for glyphn in glyphlist :
-        glyph = font.deflayer[glyphn]
-        unival = ''
-        if len(glyph["unicode"]) == 1 :
-            unival = glyph["unicode"][0].hex
-            if unival in basicchars.keys():
-                del basicchars[unival]
+    # Look up each character in the layer's unicode index, and ignore glyphs that have more than one unicode value
+    for usv in basicchars.keys():
+        for glyphn in layer.unicodeGlyphs(usv):
+            if len(layer[glyphn].unicodes) == 1:
+                del basicchars[usv]
+                break
 
     for (usv, psname) in sorted(basicchars.items()):
         logger.log(usv + " has no representative glyph (" + psname + ")")
@@ -11,8 +11,6 @@ argspec = [
 ]
 
 from silfont.core import execute
-from fontTools.ttLib.tables.DefaultTable import DefaultTable
-import lz4
 import sys, struct
 
 class lz4tuple(object) :
@@ -67,6 +65,7 @@ def parseTuple(dat, start, datlen) :
     return res
 
 def compressGr(dat, version) :
+    import lz4
     if ord(dat[1]) < version :
         dat = dat[0] + chr(version) + dat[2:]
     datc = lz4.compressHC(dat[:-4])[4:]  # strip initial length and last 4 bytes
@@ -84,6 +83,7 @@ def compressGr(dat, version) :
     return dat[0:4] + lz4hdr + datc[0:curr.start] + newend
 
 def doit(args) :
+    from fontTools.ttLib.tables.DefaultTable import DefaultTable
     infont = args.ifont
     for tag, version in (('Silf', 5), ('Glat', 3)) :
         dat = infont.getTableData(tag)
@@ -7,17 +7,17 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'David Raymond'
 
 from silfont.core import execute
-import silfont.ufo as UFO
 from xml.etree import cElementTree as ET
 
 argspec = [
-    ('fromfont',{'help': 'From font file'}, {'type': 'infont'}),
-    ('tofont',{'help': 'To font file'}, {'type': 'infont'}),
+    ('fromfont',{'help': 'From font file'}, {'type': 'infont', 'lazy': True}),
+    ('tofont',{'help': 'To font file'}, {'type': 'infont', 'lazy': True}),
     ('-l','--log',{'help': 'Log file'}, {'type': 'outfile', 'def': '_copymeta.log'}),
     ('-r','--reportonly', {'help': 'Report issues but no updating', 'action': 'store_true', 'default': False},{})
     ]
 
 def doit(args) :
+    import silfont.ufo as UFO
 
     fields = ["copyright", "openTypeNameDescription", "openTypeNameDesigner", "openTypeNameDesignerURL", "openTypeNameLicense", # General feilds
                 "openTypeNameLicenseURL", "openTypeNameManufacturer", "openTypeNameManufacturerURL", "openTypeOS2CodePageRanges",
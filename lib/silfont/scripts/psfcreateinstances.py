@@ -23,10 +23,6 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'Alan Ward'
 
 import os
-from mutatorMath.ufo.document import DesignSpaceDocumentReader
-from mutatorMath.ufo.instance import InstanceWriter
-from fontMath.mathGlyph import MathGlyph
-from mutatorMath.ufo import build as build_designspace
 from silfont.core import execute
 
 argspec = [
@@ -49,6 +45,8 @@ argspec = [
 # Using class attribs or global variables would violate encapsulation even more
 #  and would only allow for one instance of the class
 def InstanceWriterCF(output_path_prefix, calc_glyphs):
+    from mutatorMath.ufo.instance import InstanceWriter
+    from fontMath.mathGlyph import MathGlyph
 
     class LocalInstanceWriter(InstanceWriter):
 
@@ -98,6 +96,8 @@ def progress_func(state="update", action=None, text=None, tick=0):
             logger.log("%s: %s\n%s" % (state, str(action), str(text)), 'I')
 
 def doit(args):
+    from mutatorMath.ufo.document import DesignSpaceDocumentReader
+    from mutatorMath.ufo import build as build_designspace
     global logger
     logger = args.logger
 
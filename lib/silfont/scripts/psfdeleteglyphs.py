@@ -19,9 +19,9 @@ def doit(args) :
     listinput = args.input
     logger = args.logger
 
-    glyphlist = []
+    glyphlist = set()
     for line in listinput.readlines():
-        glyphlist.append(line.strip())
+        glyphlist.add(line.strip())
 
     deletelist = []
 
@@ -34,11 +34,17 @@ def doit(args) :
             if glyphname in glyphlist:
                 deletelist.append(glyphname)
 
+    # Warn about glyphs that will be left with components referring to deleted glyphs
+    deleteset = set(deletelist)
+    for deleted in sorted(deletelist):
+        for user in font.deflayer.componentUsers(deleted):
+            if user not in deleteset:
+                logger.log("%s uses %s as a component, so will be left with a missing component base" % (user, deleted), "W")
+
     logger.log("Deleted glyphs:")
 
-    for deleted in sorted(deletelist):
-        font.deflayer.delGlyph(deleted)
-        logger.log(deleted)
+    for deleted in sorted(deletelist): logger.log(deleted)
+    font.deflayer.delGlyphs(deletelist)
 
     logger.log("Total deleted glyphs: " + str(len(deletelist)))
 
@@ -10,7 +10,7 @@ from silfont.etutil import ETWriter
 from xml.etree import ElementTree as ET  ### NB: using cElementTree gives bad results
 
 argspec = [
-    ('ifont',{'help': 'Input UFO'}, {'type': 'infont'}),
+    ('ifont',{'help': 'Input UFO'}, {'type': 'infont', 'scan': True}),
     ('output',{'help': 'Output file exported anchor data in XML format', 'nargs': '?'}, {'type': 'outfile', 'def': '_anc.xml'}),
     ('-r','--report',{'help': 'Set reporting level for log', 'type':str, 'choices':['X','S','E','P','W','I','V']},{}),
     ('-l','--log',{'help': 'Set log file name'}, {'type': 'outfile', 'def': '_anc.log'}),
@@ -55,12 +55,12 @@ def doit(args) :
     for g, i in listorder:
         attrib = {'PSName': g}
         if args.gid and i != None: attrib['GID'] = str(i)
-        u = infont.deflayer[g]['unicode']
-        if len(u)>0: attrib['UID'] = prefix + u[0].element.get('hex')
+        glyph = infont.deflayer[g]
+        if len(glyph.unicodes)>0: attrib['UID'] = prefix + glyph.unicodes[0]
         glyphElement = ET.SubElement(fontElement, 'glyph', attrib)
         anchorlist = []
-        for a in infont.deflayer[g]['anchor']:
-            anchorlist.append( (a.element.get('name'), int(float(a.element.get('x'))), int(float(a.element.get('y'))) ) )
+        for name, x, y in glyph.anchors:
+            anchorlist.append( (name, int(float(x)), int(float(y)) ) )
         anchorlist.sort()
         for a, x, y in anchorlist:
             anchorElement = ET.SubElement(glyphElement, 'point', attrib = {'type': a})
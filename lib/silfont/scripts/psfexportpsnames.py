@@ -11,7 +11,7 @@ import datetime
 
 suffix = "_psnamesmap"
 argspec = [
-    ('ifont',{'help': 'Input font file'}, {'type': 'infont'}),
+    ('ifont',{'help': 'Input font file'}, {'type': 'infont', 'scan': True}),
     ('-o','--output',{'help': 'Ouput csv file'}, {'type': 'outfile', 'def': suffix+'.csv'}),
     ('-l','--log',{'help': 'Log file'}, {'type': 'outfile', 'def': suffix+'.log'}),
     ('--nocomments',{'help': 'No comments in output files', 'action': 'store_true', 'default': False},{})]
@@ -30,17 +30,13 @@ def doit(args) :
 
     for glyphn in glyphlist :
         glyph = font.deflayer[glyphn]
-        # Find PSname if present
-        PSname = None
-        if "lib" in glyph :
-            lib = glyph["lib"]
-            if "public.postscriptname" in lib : PSname = lib["public.postscriptname"][1].text
+        PSname = glyph.psname
         if PSname:
             outfile.write(glyphn + "," + PSname + "\n")
         else :
-            font.logger("No psname for " + glyphn, "W")
+            font.logger.log("No psname for " + glyphn, "W")
             missingnames = True
-    if missingnames : font.logger("Some glyphs had no psnames - see log file","E")
+    if missingnames : font.logger.log("Some glyphs had no psnames - see log file","E")
     return
 
 def cmd() : execute("UFO",doit,argspec) 
@@ -11,7 +11,7 @@ import datetime
 
 suffix = "_unicodes"
 argspec = [
-    ('ifont',{'help': 'Input font file'}, {'type': 'infont'}),
+    ('ifont',{'help': 'Input font file'}, {'type': 'infont', 'scan': True}),
     ('-o','--output',{'help': 'Output csv file'}, {'type': 'outfile', 'def': suffix+'.csv'}),
     ('-l','--log',{'help': 'Log file'}, {'type': 'outfile', 'def': suffix+'.log'}),
     ('--nocomments',{'help': 'No comments in output files', 'action': 'store_true', 'default': False},{})]
@@ -29,8 +29,8 @@ def doit(args) :
 
     for glyphn in glyphlist :
         glyph = font.deflayer[glyphn]
-        if len(glyph["unicode"]) == 1 :
-            unival = glyph["unicode"][0].hex
+        if len(glyph.unicodes) == 1 :
+            unival = glyph.unicodes[0]
             outfile.write(glyphn + "," + unival + "\n")
             
     return
@@ -7,9 +7,6 @@ __author__ = 'Victor Gaultney'
 
 from silfont.core import execute
 
-import glyphsLib
-import silfont.ufo
-import silfont.etutil
 from io import open
 import os, shutil
 
@@ -22,6 +19,9 @@ argspec = [
 
 
 def doit(args):
+    import glyphsLib
+    import silfont.ufo
+    import silfont.etutil
     logger = args.logger
     logger.log("Creating UFO objects from GlyphsApp file", "I")
     with open(args.glyphsfont, 'r', encoding='utf-8') as gfile:
@@ -6,11 +6,8 @@ __copyright__ = 'Copyright (c) 2017 SIL International  (http://www.sil.org)'
 __license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
 __author__ = 'Martin Hosken, Alan Ward'
 
-import silfont.ufo as ufo
 from collections import OrderedDict
-from silfont.feax_parser import feaplus_parser
 from xml.etree import ElementTree as et
-import fontTools.feaLib.ast as ast
 import StringIO
 import os
 
@@ -39,21 +36,20 @@ class Font(object) :
         self.all_aps = {}
 
     def readaps(self, filename, omitaps='', params = None) :
+        import silfont.ufo as ufo
         omittedaps = set(omitaps.replace(',',' ').split())  # allow comma- and/or space-separated list
         if filename.endswith('.ufo') :
-            f = ufo.Ufont(filename, params = params)
+            f = ufo.Ufont(filename, params = params, scan = True)
             self.fontinfo = f.fontinfo
             for g in f.deflayer :
                 ufo_g = f.deflayer[g]
-                advb = ufo_g['advance']
-                adv = advb.width if advb is not None else 0
+                adv = ufo_g.width if ufo_g.width is not None else 0
                 glyph = Glyph(g, advance = adv)
                 self.glyphs[g] = glyph
-                if 'anchor' in ufo_g._contents :
-                    for a in ufo_g._contents['anchor'] :
-                        if a.element.attrib['name'] not in omittedaps:
-                            glyph.add_anchor(a.element.attrib)
-                            self.all_aps.setdefault(a.element.attrib['name'], []).append(glyph)
+                for name, x, y in ufo_g.anchors :
+                    if name not in omittedaps:
+                        glyph.add_anchor({'name': name, 'x': x, 'y': y})
+                        self.all_aps.setdefault(name, []).append(glyph)
         elif filename.endswith('.xml') :
             currGlyph = None
             currPoint = None
@@ -247,6 +243,7 @@ argspec = [
 ]
 
 def doit(args) :
+    from silfont.feax_parser import feaplus_parser
     font = Font()
     if args.debug:
         import pdb; pdb.set_trace()
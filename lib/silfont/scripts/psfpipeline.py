@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+'''Run a series of UFO scripts against a font, listed in a recipe file, opening the font once and writing it once at the end.
+Each line of the recipe is a command line for a script, without the font name, eg "psfsetunicodes -i unicodes.csv".
+Scripts are looked for in silfont.scripts unless a full module name (eg mymodule.myscript) is given.'''
+__url__ = 'http://github.com/silnrsi/pysilfont'
+__copyright__ = 'Copyright (c) 2018 SIL International (http://www.sil.org)'
+__license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
+__author__ = 'David Raymond'
+
+from silfont.core import execute, chain
+import importlib, shlex, time
+
+argspec = [
+    ('ifont',{'help': 'Input font file'}, {'type': 'infont'}),
+    ('ofont',{'help': 'Output font file','nargs': '?' }, {'type': 'outfont'}),
+    ('-i','--input',{'help': 'Recipe file'}, {'type': 'infile', 'def': '_pipeline.txt'}),
+    ('-l','--log',{'help': 'Log file'}, {'type': 'outfile', 'def': '_pipeline.log'})]
+
+def doit(args) :
+    font = args.ifont
+    logger = args.logger
+    timer = args.paramsobj.timer
+
+    # Read the recipe and import all the scripts before running any, so errors are found up-front
+    steps = []
+    for linenum, line in enumerate(args.input, 1):
+        try:
+            stepargv = shlex.split(line, comments=True)
+        except ValueError as e:
+            logger.log("Invalid command on line " + str(linenum) + " of recipe: " + str(e), "S")
+        if not stepargv: continue
+        modulename = stepargv[0] if "." in stepargv[0] else "silfont.scripts." + stepargv[0]
+        try:
+            module = importlib.import_module(modulename)
+        except ImportError as e:
+            logger.log("Can't import " + modulename + " on line " + str(linenum) + " of recipe: " + str(e), "S")
+        if not (hasattr(module, "doit") and hasattr(module, "argspec")):
+            logger.log(modulename + " is not a script that can be run by psfpipeline", "S")
+        if any(arg[-1].get('scan', False) for arg in module.argspec):
+            logger.log(stepargv[0] + " opens fonts in scan mode so can't be run by psfpipeline", "S")
+        # The font's name is used as the first positional parameter so that defaults for file names are based on it
+        steps.append(([stepargv[0], font.ufodir] + stepargv[1:], module))
+
+    for stepnum, (stepargv, module) in enumerate(steps, 1):
+        start = time.time()
+        with timer.phase("step " + str(stepnum) + ": " + stepargv[0]):
+            newfont = chain(stepargv, module.doit, module.argspec, font, args.paramsobj, logger, args.quiet)
+        if newfont is not font: logger.log(stepargv[0] + " returned a different font object to the one supplied", "S")
+        logger.log("Step " + str(stepnum) + " (" + stepargv[0] + ") completed in {:.3f}s".format(time.time() - start), "P")
+
+    return font
+
+def cmd() : execute("UFO",doit,argspec)
+if __name__ == "__main__": cmd()
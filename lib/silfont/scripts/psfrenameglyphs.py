@@ -7,7 +7,6 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'Bob Hallissy'
 
 from silfont.core import execute
-from xml.etree import cElementTree as ET
 
 argspec = [
     ('ifont',{'help': 'Input font file'}, {'type': 'infont'}),
@@ -25,16 +24,16 @@ def doit(args) :
     # remember all glyphs actually renamed:
     nameMap = {}
 
-    # Obtain lib.plist glyph order(s) and psnames if they exist:
-    publicGlyphOrder = csGlyphOrder = psnames = None
-    if 'public.glyphOrder' in font.lib:
-        publicGlyphOrder = font.lib.getval('public.glyphOrder')     # This is an array
-    if 'com.schriftgestaltung.glyphOrder' in font.lib:
-        csGlyphOrder = font.lib.getval('com.schriftgestaltung.glyphOrder') # This is an array
-    if 'public.postscriptNames' in font.lib:
-        psnames = font.lib.getval('public.postscriptNames')   # This is a dict keyed by glyphnames
+    # Read the renames from the csv, ignoring the header row and rows where the newname is blank or same as oldname
+    renames = []
+    for r in incsv:
+        oldname = r[0]
+        newname = r[1]
+        if oldname == "Name" or newname == "" or oldname == newname:
+            continue
+        renames.append((oldname, newname, incsv.line_num))
 
-    # Renaming is done in two passes to make sure we can handle circular renames such as:
+    # Renaming has to handle circular renames such as:
     #    someglyph.alt = someglyph
     #    someglyph = someglyph.alt
 
@@ -42,7 +41,7 @@ def doit(args) :
     # done independently since the same glyph names are not necessarily in all
     # three structures.
 
-    # First pass: process all records of csv, and for each glyph that is to be renamed:
+    # The font itself is renamed in two passes.  First pass: for each glyph that is to be renamed:
     #   If the new glyphname is not already present, go ahead and rename it now.
     #   If the new glyph name already exists, rename the glyph to a temporary name
     #      and put relevant details in saveforlater[]
@@ -57,19 +56,9 @@ def doit(args) :
             if f(name): return name
 
     saveforlaterFont = []   # For the font itself
-    saveforlaterPGO = []    # For public.GlyphOrder
-    saveforlaterCSGO = []   # For GlyphsApp GlyphOrder (com.schriftgestaltung.glyphOrder)
-    saveforlaterPSN = []    # For public.postscriptNames
     deletelater = []        # Glyphs we'll delete after merging
 
-    for r in incsv:
-        oldname = r[0]
-        newname = r[1]
-        # ignore header row and rows where the newname is blank or same as oldname
-        if oldname == "Name" or newname == "" or oldname == newname:
-            continue
-
-        # Handle font first:
+    for (oldname, newname, linenum) in renames:
         if oldname not in font.deflayer:
             logger.log("glyph name not in font: " + oldname , "I")
         elif newname not in font.deflayer:
@@ -93,6 +82,7 @@ def doit(args) :
                     else:
                         # Append anchor to glyph
                         existingGlyph['anchor'].append(a)
+                    font.deflayer.updateIndexes(existingGlyph)
             nameMap[oldname] = newname
             deletelater.append(oldname)
             logger.log("Pass 1 (Font): merged %s to %s" % (oldname, newname), "I")
@@ -103,61 +93,6 @@ def doit(args) :
             font.deflayer[oldname].name = tempname
             saveforlaterFont.append( (tempname, oldname, newname) )
 
-        # Similar algorithm for public.glyphOrder, if present:
-        if publicGlyphOrder:
-            if oldname not in publicGlyphOrder:
-                logger.log("glyph name not in publicGlyphorder: " + oldname , "I")
-            else:
-                x = publicGlyphOrder.index(oldname)
-                if newname not in publicGlyphOrder:
-                    publicGlyphOrder[x] = newname
-                    nameMap[oldname] = newname
-                    logger.log("Pass 1 (PGO): Renamed %s to %s" % (oldname, newname), "I")
-                elif mergemode:
-                    del publicGlyphOrder[x]
-                    nameMap[oldname] = newname
-                    logger.log("Pass 1 (PGO): Removed %s (now using %s)" % (oldname, newname), "I")
-                else:
-                    tempname = gettempname(lambda n : n not in publicGlyphOrder)
-                    publicGlyphOrder[x] = tempname
-                    saveforlaterPGO.append( (x, oldname, newname) )
-
-        # And for GlyphsApp glyph order, if present:
-        if csGlyphOrder:
-            if oldname not in csGlyphOrder:
-                logger.log("glyph name not in csGlyphorder: " + oldname , "I")
-            else:
-                x = csGlyphOrder.index(oldname)
-                if newname not in csGlyphOrder:
-                    csGlyphOrder[x] = newname
-                    nameMap[oldname] = newname
-                    logger.log("Pass 1 (csGO): Renamed %s to %s" % (oldname, newname), "I")
-                elif mergemode:
-                    del csGlyphOrder[x]
-                    nameMap[oldname] = newname
-                    logger.log("Pass 1 (csGO): Removed %s (now using %s)" % (oldname, newname), "I")
-                else:
-                    tempname = gettempname(lambda n : n not in csGlyphOrder)
-                    csGlyphOrder[x] = tempname
-                    saveforlaterCSGO.append( (x, oldname, newname) )
-
-        # Finally, psnames
-        if psnames:
-            if oldname not in psnames:
-                logger.log("glyph name not in psnames: " + oldname , "I")
-            elif newname not in psnames:
-                psnames[newname] = psnames.pop(oldname)
-                nameMap[oldname] = newname
-                logger.log("Pass 1 (psn): Renamed %s to %s" % (oldname, newname), "I")
-            elif mergemode:
-                del psnames[oldname]
-                nameMap[oldname] = newname
-                logger.log("Pass 1 (psn): Removed %s (now using %s)" % (oldname, newname), "I")
-            else:
-                tempname = gettempname(lambda n: n not in psnames)
-                psnames[tempname] = psnames.pop(oldname)
-                saveforlaterPSN.append( (tempname, oldname, newname))
-
     # Second pass: now we can reprocess those things we saved for later:
     #    If the new glyphname is no longer present, we can complete the renaming
     #    Otherwise we've got a fatal error
@@ -172,73 +107,76 @@ def doit(args) :
             nameMap[oldname] = newname
             logger.log("Pass 2 (Font): Renamed %s to %s" % (oldname, newname), "I")
 
-    for j in saveforlaterPGO:
-        x, oldname, newname = j
-        if newname in publicGlyphOrder:
-            # Ok, this really is a problem
-            logger.log("Glyph %s already in public.GlyphOrder; can't rename %s" % (newname, oldname), "S")
-        else:
-            publicGlyphOrder[x] = newname
-            nameMap[oldname] = newname
-            logger.log("Pass 2 (PGO): Renamed %s to %s" % (oldname, newname), "I")
+    # The glyph orders and psnames are renamed with all the renames treated as happening at once (see planrenames()),
+    # then written back in a single pass
 
-    for j in saveforlaterCSGO:
-        x, oldname, newname = j
-        if newname in csGlyphOrder:
-            # Ok, this really is a problem
-            logger.log("Glyph %s already in com.schriftgestaltung.glyphOrder; can't rename %s" % (newname, oldname), "S")
-        else:
-            csGlyphOrder[x] = newname
-            nameMap[oldname] = newname
-            logger.log("Pass 2 (csGO): Renamed %s to %s" % (oldname, newname), "I")
+    for (name, desc) in (('public.glyphOrder', 'PGO'), ('com.schriftgestaltung.glyphOrder', 'csGO')):
+        if name in font.lib:
+            glyphOrder = font.lib.getval(name)  # This is an array
+            (renamed, merged) = planrenames(set(glyphOrder), renames, mergemode, logger, desc, name)
+            if renamed or merged:
+                font.lib.setarray(name, [renamed.get(n, n) for n in glyphOrder if n not in merged])
+            nameMap.update(renamed)
+            nameMap.update(merged)
 
-    for tempname, oldname, newname in saveforlaterPSN:
-        if newname in psnames:
-            # Ok, this really is a problem
-            logger.log("Glyph %s already in public.postscriptNames; can't rename %s" % (newname, oldname), "S")
-        else:
-            psnames[newname] = psnames.pop(tempname)
-            nameMap[oldname] = newname
-            logger.log("Pass 2 (psn): Renamed %s to %s" % (oldname, newname), "I")
-
-    # Finally rebuild font structures from the modified lists we have:
-
-    # Rebuild glyph order elements:
-    if publicGlyphOrder:
-        array = ET.Element("array")
-        for name in publicGlyphOrder:
-            ET.SubElement(array, "string").text = name
-        font.lib.setelem("public.glyphOrder", array)
-
-    if csGlyphOrder:
-        array = ET.Element("array")
-        for name in csGlyphOrder:
-            ET.SubElement(array, "string").text = name
-        font.lib.setelem("com.schriftgestaltung.glyphOrder", array)
-
-    # Rebuild postscriptNames:
-    if psnames:
-        dict = ET.Element("dict")
-        for n in psnames:
-            ET.SubElement(dict, "key").text = n
-            ET.SubElement(dict, "string").text = psnames[n]
-        font.lib.setelem("public.postscriptNames", dict)
-
-    # Iterate over all glyphs, and fix up any components that reference renamed glyphs
-    for name in font.deflayer:
-        for component in font.deflayer[name].etree.findall('./outline/component[@base]'):
-            oldname = component.get('base')
-            if oldname in nameMap:
-                component.set('base', nameMap[oldname])
+    if 'public.postscriptNames' in font.lib:
+        psnames = font.lib.getval('public.postscriptNames')  # This is a dict keyed by glyphnames
+        (renamed, merged) = planrenames(psnames, renames, mergemode, logger, 'psn', 'psnames')
+        if renamed or merged:
+            font.lib.setdict('public.postscriptNames',
+                             [(renamed.get(n, n), psnames[n]) for n in sorted(psnames) if n not in merged])
+        nameMap.update(renamed)
+        nameMap.update(merged)
+
+    # Fix up any components that reference renamed glyphs, using the layer's index to find the glyphs that use them
+    # All the changes are found before any are made, to allow for circular renames
+    compchanges = []
+    for oldname in nameMap:
+        for name in font.deflayer.componentUsers(oldname):
+            for component in font.deflayer[name]['outline'].components:
+                if component.base == oldname: compchanges.append((component, nameMap[oldname]))
+    for (component, newname) in compchanges: component.base = newname
 
     # Finally delete anything we no longer need:
-    for name in deletelater:
-        font.deflayer.delGlyph(name)
-        logger.log("glyph %s removed" % name, "I")
+    for name in deletelater: logger.log("glyph %s removed" % name, "I")
+    font.deflayer.delGlyphs(deletelater)
 
     logger.log("%d glyphs renamed" % (len(nameMap)), "P")
     return font
 
+def planrenames(present, renames, mergemode, logger, desc, longdesc):
+    ''' Work out the renames for a structure containing the glyph names in present, treating all the renames as happening
+    at once, so circular renames need no temporary names.  A rename clashes if the new name is in present and is not
+    itself being renamed, or is the new name for an earlier rename.  With mergemode the old name is then removed (merged
+    with the new one), otherwise it is a fatal error.  Returns a dict of oldname: newname for renames and another for
+    merges.  renames is a list of (oldname, newname, csv line number)'''
+    planned = {}
+    order = []
+    for (oldname, newname, linenum) in renames:
+        if oldname in planned:
+            logger.log("Duplicate rename of %s on line %d of csv ignored for %s" % (oldname, linenum, longdesc), "W")
+        elif oldname not in present:
+            logger.log("glyph name not in %s: %s" % (longdesc, oldname), "I")
+        else:
+            planned[oldname] = newname
+            order.append(oldname)
+    renamed = {}
+    merged = {}
+    targets = set()
+    for oldname in order:
+        newname = planned[oldname]
+        if (newname in present and newname not in planned) or newname in targets:
+            if mergemode:
+                merged[oldname] = newname
+                logger.log("(%s): Removed %s (now using %s)" % (desc, oldname, newname), "I")
+            else:
+                logger.log("Glyph %s already in %s; can't rename %s" % (newname, longdesc, oldname), "S")
+        else:
+            renamed[oldname] = newname
+            targets.add(newname)
+            logger.log("(%s): Renamed %s to %s" % (desc, oldname, newname), "I")
+    return (renamed, merged)
+
 def cmd() : execute("UFO",doit,argspec) 
 
 if __name__ == "__main__": cmd()
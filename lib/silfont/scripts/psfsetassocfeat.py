@@ -21,32 +21,20 @@ def doit(args) :
     incsv.minfields = 2
     incsv.maxfields = 3
     incsv.logger = font.logger
-    glyphlist = font.deflayer.keys() # Identify which glifs have not got an AssocFeat set
 
-    for line in incsv :
-        glyphn = line[0]
-        feature = line[1]
-        value = line[2] if len(line) == 3 else ""
-
-        if glyphn in glyphlist :
-            glyph = font.deflayer[glyphn]
-            if glyph["lib"] is None : glyph.add("lib")
-            glyph["lib"].setval("org.sil.assocFeature","string",feature)
-            if value is not "" :
-                glyph["lib"].setval("org.sil.assocFeatureValue","integer",value)
-            else :
-                if "org.sil.assocFeatureValue" in glyph["lib"] : glyph["lib"].remove("org.sil.assocFeatureValue")
-            glyphlist.remove(glyphn)
+    # Read the csv then set the values in the glif libs, removing them from any glyphs not in the csv
+    features = {}
+    values = {}
+    for (glyphn, fields) in incsv.mapping(valcol=None).items() :
+        if glyphn in font.deflayer :
+            features[glyphn] = fields[0]
+            if len(fields) == 2 and fields[1] != "" : values[glyphn] = fields[1]
         else :
-            font.logger.log("No glyph in font for " + glyphn + " on line " + str(incsv.line_num),"E")
+            font.logger.log("No glyph in font for " + glyphn + " on line " + str(incsv.keylines[glyphn]),"E")
 
-    for glyphn in glyphlist : # Remove any values from remaining glyphs
-        glyph = font.deflayer[glyphn]
-        if glyph["lib"] :
-            if "org.sil.assocFeatureValue" in glyph["lib"] : glyph["lib"].remove("org.sil.assocFeatureValue")
-            if "org.sil.assocFeature" in glyph["lib"] :
-                glyph["lib"].remove("org.sil.assocFeature")
-                font.logger.log("Feature info removed for " + glyphn,"I")
+    font.deflayer.setGlifLibs("org.sil.assocFeatureValue", values, "integer")
+    for glyphn in font.deflayer.setGlifLibs("org.sil.assocFeature", features) :
+        font.logger.log("Feature info removed for " + glyphn,"I")
 
     return font
 
@@ -21,29 +21,22 @@ def doit(args) :
     incsv = args.input
     incsv.minfields = 2
     incsv.logger = font.logger
-    glyphlist = font.deflayer.keys() # Identify which glifs have not got AssocUIDs set
 
-    for line in incsv :
-        glyphn = line.pop(0)
-        if glyphn in glyphlist :
-            glyph = font.deflayer[glyphn]
-            if glyph["lib"] is None : glyph.add("lib")
+    # Read the csv then set the values in the glif libs, removing them from any glyphs not in the csv
+    arrays = {}
+    for (glyphn, UIDs) in incsv.mapping(valcol=None).items() :
+        if glyphn in font.deflayer :
             # Create an array element for the UID value(s)
             array = ET.Element("array")
-            for UID in line:
+            for UID in UIDs:
                 sub = ET.SubElement(array,"string")
                 sub.text = UID
-            glyph["lib"].setelem("org.sil.assocUIDs",array)
-            glyphlist.remove(glyphn)
+            arrays[glyphn] = array
         else :
-            font.logger.log("No glyph in font for " + glyphn + " on line " + str(incsv.line_num),"E")
+            font.logger.log("No glyph in font for " + glyphn + " on line " + str(incsv.keylines[glyphn]),"E")
 
-    for glyphn in glyphlist : # Remove any values from remaining glyphs
-        glyph = font.deflayer[glyphn]
-        if glyph["lib"] :
-            if "org.sil.assocUIDs" in glyph["lib"] :
-                glyph["lib"].remove("org.sil.assocUIDs")
-                font.logger.log("UID info removed for " + glyphn,"I")
+    for glyphn in font.deflayer.setGlifLibs("org.sil.assocUIDs", arrays) :
+        font.logger.log("UID info removed for " + glyphn,"I")
 
     return font
 
@@ -9,7 +9,6 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'David Raymond'
 
 from silfont.core import execute
-from xml.etree import cElementTree as ET
 
 argspec = [
     ('ifont', {'help': 'Input font file'}, {'type': 'infont'}), 
@@ -64,23 +63,20 @@ def doit(args):
 
     # Now process the data
     if "lib" not in font.__dict__: font.addfile("lib")
-    glyphlist = font.deflayer.keys()  # List to check every glyph has a record in the list
+    glyphlist = set(font.deflayer.keys())  # To check every glyph has a record in the list
 
     for i in range(1,fieldcount+1):
         glyphdata = sorted(glyphdata, key=lambda row: row[i])
-        array = ET.Element("array")
-        for row in glyphdata:
-            glyphn = row[0]
-            sub = ET.SubElement(array, "string")
-            sub.text = glyphn
-            if i == 1:  # check glyphs exist in font during the first pass
+        if i == 1:  # check glyphs exist in font during the first pass
+            for row in glyphdata:
+                glyphn = row[0]
                 if glyphn in glyphlist:
                     glyphlist.remove(glyphn)  # So glyphlist ends up with those without an entry
                 else:
                     font.logger.log("No glyph in font for " + glyphn, "I")
-        font.lib.setelem(fields[i-1],array)
+        font.lib.setarray(fields[i-1], [row[0] for row in glyphdata])
 
-    for glyphn in glyphlist:  # Remaining glyphs were not in the input file
+    for glyphn in sorted(glyphlist):  # Remaining glyphs were not in the input file
         font.logger.log("No entry in input file for font glyph " + glyphn, "I")
 
     return font
@@ -9,7 +9,7 @@ from silfont.core import execute
 
 suffix = "_setkeys"
 argspec = [
-    ('ifont',{'help': 'Input font file'}, {'type': 'infont'}),
+    ('ifont',{'help': 'Input font file'}, {'type': 'infont', 'lazy': True}),
     ('ofont',{'help': 'Output font file','nargs': '?' }, {'type': 'outfont'}),
     ('--plist',{'help': 'Select plist to modify'}, {'def': 'fontinfo'}),
     ('-i','--input',{'help': 'Input csv file'}, {'type': 'incsv', 'def': None}),
@@ -8,7 +8,6 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'David Raymond'
 
 from silfont.core import execute
-from xml.etree import cElementTree as ET
 
 argspec = [
     ('ifont', {'help': 'Input font file'}, {'type': 'infont'}),
@@ -23,7 +22,7 @@ def doit(args):
     logger = args.logger
     incsv = args.input
     gname = args.gname
-    glyphlist = font.deflayer.keys()  # List to check every glyph has a psname supplied
+    glyphlist = set(font.deflayer.keys())  # To check every glyph has a psname supplied
 
     # Identify file format from first line
     fl = incsv.firstline
@@ -47,31 +46,25 @@ def doit(args):
         logger.log("Invalid csv file", "S")
 
     # Now process the data
-    dict = ET.Element("dict")
-    for line in incsv:
-        glyphn = line[glyphnpos]
-        psname = line[psnamepos]
+    psnames = []
+    for (glyphn, psname) in incsv.mapping(glyphnpos, psnamepos).items():
         if len(psname) == 0 or glyphn == psname:
             continue	# No need to include cases where production name is blank or same as working name
-        # Add to dict
-        sub = ET.SubElement(dict, "key")
-        sub.text = glyphn
-        sub = ET.SubElement(dict, "string")
-        sub.text = psname
+        psnames.append((glyphn, psname))
         # Check if in font
         if glyphn in glyphlist:
             glyphlist.remove(glyphn)
         else:
-            logger.log("No glyph in font for " + glyphn + " on line " + str(incsv.line_num), "I")
+            logger.log("No glyph in font for " + glyphn + " on line " + str(incsv.keylines[glyphn]), "I")
     # Add to lib.plist
-    if len(dict) > 0:
+    if len(psnames) > 0:
         if "lib" not in font.__dict__: font.addfile("lib")
-        font.lib.setelem("public.postscriptNames", dict)
+        font.lib.setdict("public.postscriptNames", psnames)
     else:
         if "lib" in font.__dict__ and "public.postscriptNames" in font.lib:
             font.lib.remove("public.postscriptNames")
 
-    for glyphn in glyphlist: logger.log("No PS name in input file for font glyph " + glyphn, "I")
+    for glyphn in sorted(glyphlist): logger.log("No PS name in input file for font glyph " + glyphn, "I")
 
     return font
 
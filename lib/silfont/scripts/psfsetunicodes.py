@@ -40,15 +40,13 @@ def doit(args) :
     else:
         logger.log("Invalid csv file", "S")
 
-    # List of glyphnames actually in the font:
-    glyphlist = font.deflayer.keys()
-
-    # Create mapping to find glyph name from decimal usv:
-    dusv2gname = {int(unicode.hex, 16): gname for gname in glyphlist for unicode in font.deflayer[gname]['unicode']}
+    layer = font.deflayer
 
     # Remember what glyphnames we've processed:
     processed = set()
 
+    # Glyphs already encoding a unicode value are found using the layer's unicode index, which is kept up to date as
+    # unicodes are added and removed
     for line in incsv :
         glyphn = line[nameCol]
         try:
@@ -58,34 +56,32 @@ def doit(args) :
             continue
         unival = "%04X" % dusv  # Standardize to 4 (or more) digits and caps
 
-        if glyphn in glyphlist :
-            glyph = font.deflayer[glyphn]
+        if glyphn in layer :
+            glyph = layer[glyphn]
 
             # If this is the first time we've seen this glyphname and there is only one unicode value on this glyph, assume we are replacing it.
             if glyphn not in processed and len(glyph["unicode"]) == 1 :
-                del dusv2gname[int(glyph["unicode"][0].hex, 16)]
                 glyph.remove("unicode",index = 0)
 
             # See if any glyph already encodes this unicode value:
-            if dusv in dusv2gname:
-                # Yes ... some glyph does.
-                if dusv2gname[dusv] == glyphn:
-                    # Oh, it's me!  Do nothing except remember we processed this glyph:
-                    processed.add(glyphn)
-                    continue
+            oglyphns = layer.unicodeGlyphs(dusv)
+            if glyphn in oglyphns:
+                # Oh, it's me!  Do nothing except remember we processed this glyph:
+                processed.add(glyphn)
+                continue
+            for oglyphn in oglyphns:
                 # Not me, so remove this encoding from the other glyph:
-                oglyph = font.deflayer[dusv2gname[dusv]]
+                oglyph = layer[oglyphn]
                 for unicode in oglyph["unicode"]:
                     if int(unicode.hex,16) == dusv:
                         oglyph.remove("unicode", object=unicode)
                         break
 
-            # Finally add this unicode value, record that we processed this glyphname, and update dusv2gname
+            # Finally add this unicode value and record that we processed this glyphname
             glyph.add("unicode",{"hex": unival})
             processed.add(glyphn)
-            dusv2gname[dusv] = glyphn
         else :
-            logger.log("Glyph '%s' not in font; line %d ignored." % (glyphn, str(incsv.line_num)), "I")
+            logger.log("Glyph '%s' not in font; line %d ignored." % (glyphn, incsv.line_num), "I")
 
     return font
 
@@ -6,11 +6,10 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'David Raymond'
 
 from silfont.core import execute
-import silfont.ufo as UFO
 import re
 
 argspec = [
-    ('font',{'help': 'From font file'}, {'type': 'infont'}),
+    ('font',{'help': 'From font file'}, {'type': 'infont', 'lazy': True}),
     ('newversion',{'help': 'Version string or increment', 'nargs': '?'}, {}),
     ('-l','--log',{'help': 'Log file'}, {'type': 'outfile', 'def': '_setversion.log'})
     ]
@@ -18,6 +17,7 @@ argspec = [
 otnvre = re.compile('Version (\d)\.(\d\d\d)( .+)?$')
 
 def doit(args) :
+    import silfont.ufo as UFO
 
     font = args.font
     logger = args.logger
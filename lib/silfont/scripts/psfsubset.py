@@ -7,7 +7,6 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'Bob Hallissy'
 
 from silfont.core import execute
-from xml.etree import cElementTree as ET
 import re
 
 argspec = [
@@ -23,9 +22,6 @@ def doit(args) :
     logger = args.logger
     deflayer = font.deflayer
 
-    # Create mappings to find glyph name from decimal usv:
-    dusv2gname = {int(unicode.hex, 16): gname for gname in deflayer for unicode in deflayer[gname]['unicode']}
-
     # check for headers in the csv
     fl = incsv.firstline
     if fl is None: logger.log("Empty imput file", "S")
@@ -50,9 +46,9 @@ def doit(args) :
         gname = r[dataCol].strip()
         if usvRE.match(gname):
             # data is USV, not glyph name
-            dusv = int(gname,16)
-            if dusv in dusv2gname:
-                toProcess.add(dusv2gname[dusv])
+            gnames = deflayer.unicodeGlyphs(gname)
+            if gnames:
+                toProcess.add(gnames[0])
                 continue
             # The USV wasn't in the font... try it as a glyph name
         if gname not in deflayer:
@@ -60,27 +56,20 @@ def doit(args) :
             continue
         toProcess.add(gname)
 
-    # Generate a complete list of glyphs to keep:
+    # Generate a complete list of glyphs to keep, including any glyphs used as components by them:
     toKeep = set()
-    while len(toProcess):
-        gname = toProcess.pop()   # retrieves a random item from the set
-        if gname in toKeep:
-            continue    # Already processed this one
-        toKeep.add(gname)
-        
-        # If it has any components we haven't already processed, add them to the toProcess list
-        for component in deflayer[gname].etree.findall('./outline/component[@base]'):
-            cname = component.get('base')
-            if cname not in toKeep:
-                toProcess.add(cname)
+    for gname in deflayer.componentClosure(toProcess):
+        if gname in deflayer:
+            toKeep.add(gname)
+        else:
+            logger.log("Component base '%s' not in font" % gname, 'W')
 
     # Generate a complete list of glyphs to delete:
     toDelete = set(deflayer).difference(toKeep)
 
     # Remove any glyphs not in the toKeep set
-    for gname in toDelete:
-        logger.log("Deleting " + gname, "V")
-        deflayer.delGlyph(gname)
+    for gname in toDelete: logger.log("Deleting " + gname, "V")
+    deflayer.delGlyphs(toDelete)
     assert len(deflayer) == len(toKeep), "len(deflayer) != len(toKeep)"
     logger.log("Retained %d glyphs, deleted %d glyphs." % (len(toKeep), len(toDelete)), "P")
 
@@ -88,21 +77,12 @@ def doit(args) :
     for orderName in ('public.glyphOrder', 'com.schriftgestaltung.glyphOrder'):
         if orderName in font.lib:
             glyphOrder = font.lib.getval(orderName)  # This is an array
-            array = ET.Element("array")
-            for gname in glyphOrder:
-                if gname in toKeep:
-                    ET.SubElement(array, "string").text = gname
-            font.lib.setelem(orderName, array)
+            font.lib.setarray(orderName, [gname for gname in glyphOrder if gname in toKeep])
 
     # Clean up and rebuild psnames
     if 'public.postscriptNames' in font.lib:
         psnames = font.lib.getval('public.postscriptNames')  # This is a dict keyed by glyphnames
-        dict = ET.Element("dict")
-        for gname in psnames:
-            if gname in toKeep:
-                ET.SubElement(dict, "key").text = gname
-                ET.SubElement(dict, "string").text = psnames[gname]
-        font.lib.setelem("public.postscriptNames", dict)
+        font.lib.setdict("public.postscriptNames", [(gname, psnames[gname]) for gname in psnames if gname in toKeep])
 
     return font
 
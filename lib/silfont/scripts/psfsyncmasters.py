@@ -6,10 +6,7 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'David Raymond'
 
 from silfont.core import execute
-import silfont.ufo as UFO
-import silfont.etutil as ETU
 import os
-import designSpaceDocument as DSD
 from xml.etree import cElementTree as ET
 
 argspec = [
@@ -20,6 +17,7 @@ argspec = [
     ]
 
 def doit(args) :
+    import designSpaceDocument as DSD
     ficopyreq = ("ascender", "copyright", "descender", "familyName", "openTypeHheaAscender",
                   "openTypeHheaDescender", "openTypeHheaLineGap", "openTypeNameDescription", "openTypeNameDesigner",
                   "openTypeNameDesignerURL", "openTypeNameLicense", "openTypeNameLicenseURL",
@@ -171,6 +169,8 @@ def doit(args) :
 
 class Dsource(object):
     def __init__(self, ds, source, logger, frompds, args):
+        import silfont.ufo as UFO
+        import silfont.etutil as ETU
         self.ds = ds
         self.source = source
         self.logger = logger
@@ -224,6 +224,7 @@ class Dsource(object):
         self.outparams["UFOversion"] = 9 # Dummy value since not currently needed
 
     def write(self, plistn):
+        import silfont.ufo as UFO
         filen = plistn + self.newfile + ".plist"
         self.logger.log("Writing updated " + plistn + ".plist to " + filen, "P")
         exists = True if os.path.isfile(os.path.join(self.ufodir, filen)) else False
@@ -7,7 +7,6 @@ __author__ = 'David Raymond'
 
 from silfont.core import execute
 from datetime import datetime
-import silfont.ufo as UFO
 import os
 from xml.etree import cElementTree as ET
 
@@ -22,6 +21,7 @@ argspec = [
     ]
 
 def doit(args) :
+    import silfont.ufo as UFO
     standardstyles = ["Regular", "Italic", "Bold", "BoldItalic"]
     finfoignore = ["openTypeHeadCreated", "openTypeOS2Panose", "postscriptBlueScale", "postscriptBlueShift",
                    "postscriptBlueValues", "postscriptOtherBlues", "postscriptStemSnapH", "postscriptStemSnapV", "postscriptForceBold"]
@@ -286,8 +286,9 @@ def doit(args) :
 
 
 def openfont(params, path, family, style) : # Only try if directory esists
+    import silfont.ufo as UFO
     ufodir = os.path.join(path,family+"-"+style+".ufo")
-    font = UFO.Ufont(ufodir, params=params) if os.path.isdir(ufodir) else None
+    font = UFO.Ufont(ufodir, params=params, lazy=True) if os.path.isdir(ufodir) else None
     return font
 
 
@@ -15,9 +15,7 @@ __author__ = 'Victor Gaultney'
 
 # main input, output, and execution handled by pysilfont framework
 from silfont.core import execute
-import silfont.ufo as UFO
 
-from robofab.world import OpenFont
 
 from math import tan, radians, sqrt
 
@@ -307,6 +305,8 @@ def rebuildTLComps(targetfont):
 
 
 def doit(args):
+    import silfont.ufo as UFO
+    from robofab.world import OpenFont
 
     psffont = UFO.Ufont(args.ifont, params = args.paramsobj)
     rffont = OpenFont(args.ifont)
@@ -9,7 +9,6 @@ __author__ = 'Alan Ward'
 # and curve conversion seems to happen in a different way.
 
 from silfont.core import execute
-import defcon, ufo2ft.outlineCompiler, ufo2ft.preProcessor
 
 argspec = [
     ('iufo', {'help': 'Input UFO folder'}, {}),
@@ -19,6 +18,7 @@ argspec = [
 PUBLIC_PREFIX = 'public.'
 
 def doit(args):
+    import defcon, ufo2ft.outlineCompiler, ufo2ft.preProcessor
     ufo = defcon.Font(args.iufo)
 
 #    args.logger.log('Converting UFO to ttf and compiling fea')
@@ -6,16 +6,20 @@ __license__ = 'Released under the MIT License (http://opensource.org/licenses/MI
 __author__ = 'David Raymond'
 
 from xml.etree import cElementTree as ET
-import sys, os, shutil, filecmp
+import sys, os, shutil, filecmp, marshal, hashlib
 import warnings
 import collections
 import datetime
 import silfont.core
 import silfont.util as UT
 import silfont.etutil as ETU
+from array import array
 
 _glifElemMulti = ('unicode', 'guideline', 'anchor')  # glif elements that can occur multiple times
 _glifElemF1 = ('advance', 'unicode', 'outline', 'lib')  # glif elements valid in format 1 glifs (ie UFO2 glfis)
+_compAttribs = (("xScale", 1), ("xyScale", 0), ("yxScale", 0), ("yScale", 1), ("xOffset", 0), ("yOffset", 0))  # With defaults
+_numpy = None  # Set by _importNumpy()
+_indexNames = ("unicode", "component", "anchor")  # Ulayer indexes, in the order of the keys from _indexKeys()
 
 # Define illegal characters and reserved names for makeFileName
 _illegalChars = "\"*+/:><?[\]|" + chr(0x7F)
@@ -26,6 +30,8 @@ _reservedNames = "CON PRN AUX CLOCK$ NUL COM1 COM2 COM3 COM4 PT1 LPT2 LPT3".lowe
 
 class _Ucontainer(object):
     # Parent class for other objects (eg Ulayer)
+    __slots__ = ()  # So that subclasses can use slots; those that don't still get a __dict__
+
     def __init__(self):
         self._contents = {}
 
@@ -40,6 +46,9 @@ class _Ucontainer(object):
     def __iter__(self):
         return iter(self._contents)
 
+    def __contains__(self, key):  # Otherwise "in" would fall back to iterating through the keys
+        return key in self._contents
+
     def keys(self):
         return self._contents.keys()
 
@@ -98,6 +107,20 @@ class _plist(object):
         self.etree[0].remove(item[1])
         del self._contents[key]
 
+    def removekeys(self, keys):  # Remove several keys in one pass through the dict, rather than one pass per key
+        elemids = set()
+        for key in keys:
+            elemids.update(id(elem) for elem in self._contents.pop(key))
+        if elemids:
+            dict = self.etree[0]
+            dict[:] = [elem for elem in dict if id(elem) not in elemids]
+
+    def rename(self, key, newkey):  # Change a key in place, keeping its value
+        if newkey in self._contents: self.font.logger.log("Attempt to add duplicate key " + newkey + " to plist", "X")
+        item = self._contents.pop(key)
+        item[0].text = newkey
+        self._contents[newkey] = item
+
     def addelem(self, key, element):  # For non-simple elements (eg arrays) the calling script needs to build the etree element
         if key in self._contents: self.font.logger.log("Attempt to add duplicate key " + key + " to plist", "X")
         dict = self.etree[0]
@@ -113,18 +136,39 @@ class _plist(object):
         if key in self._contents: self.remove(key)
         self.addelem(key, element)
 
+    def setarray(self, key, values, valuetype="string"):  # Set key to an array built from a list of values
+        array = ET.Element("array")
+        for value in values: ET.SubElement(array, valuetype).text = str(value) if valuetype != "string" else value
+        self.setelem(key, array)
+
+    def setdict(self, key, items, valuetype="string"):  # Set key to a dict built from a list of (key, value) pairs
+        dict = ET.Element("dict")
+        for (subkey, value) in items:
+            ET.SubElement(dict, "key").text = subkey
+            ET.SubElement(dict, valuetype).text = str(value) if valuetype != "string" else value
+        self.setelem(key, dict)
+
 
 class Uelement(_Ucontainer):
     # Class for an etree element. Mainly used as a parent class
     # For each tag in the element, returns list of sub-elements with that tag
+    # There are many of these objects for each glyph, so they use slots, and the list of sub-elements is only built
+    # when first needed since most elements have none.  Subclasses need to list any attributes they set in __slots__
+    __slots__ = ("element", "_index")
+
     def __init__(self, element):
         self.element = element
-        self.reindex()
+        self._index = None
+
+    @property
+    def _contents(self):
+        if self._index is None: self.reindex()
+        return self._index
 
     def reindex(self):
-        self._contents = collections.defaultdict(list)
+        self._index = collections.defaultdict(list)
         for e in self.element:
-            self._contents[e.tag].append(e)
+            self._index[e.tag].append(e)
 
     def remove(self, subelement):
         self._contents[subelement.tag].remove(subelement)
@@ -153,7 +197,7 @@ class UtextFile(object):
         if dirn == font.ufodir:
             dtree = font.dtree
         else:
-            dtree = font.dtree.subtree(dirn)
+            dtree = font.dtree.subTree(dirn)
             if not dtree: font.logger.log("Missing directory " + dirn, "X")
         if filen not in dtree:
             dtree[filen] = UT.dirTreeItem(added=True)
@@ -204,10 +248,34 @@ class Udirectory(object):
             sys.exit(1)
         dtreeitem.written = True
 
+class UlazyGlif(object):
+    # Placeholder for a glif in a lazy layer that has not yet been read.  Ulayer replaces it with a Uglif on first access.
+    # If still unread when the font is written, the glif file is copied to the output unchanged
+    def __init__(self, layer, filen):
+        self.type = "lazyglif"
+        self.layer = layer
+        self.filen = filen
+
+    def write(self, dtreeitem, dir, ofilen, exists):
+        inpath = os.path.join(self.layer.font.ufodir, self.layer.layerdir, self.filen)
+        changed = True
+        if exists == "Same":  # Output and input locations the same, so file is already there
+            changed = False
+        elif exists:
+            changed = not (filecmp.cmp(inpath, os.path.join(dir, ofilen)))
+        if changed:
+            try:
+                shutil.copy2(inpath, os.path.join(dir, ofilen))
+            except Exception as e:
+                print(e)
+                sys.exit(1)
+        dtreeitem.written = True
+        return changed
+
 class Ufont(object):
     """ Object to hold all the data from a UFO"""
 
-    def __init__(self, ufodir, logger=None, params=None):
+    def __init__(self, ufodir, logger=None, params=None, lazy=False, scan=False):
         if logger is not None and params is not None:
             params.logger.log("Only supply a logger if params not set (since that has one)", "X")
         if params is None:
@@ -217,6 +285,9 @@ class Ufont(object):
         self.logger = params.logger
         logger = self.logger
         self.ufodir = ufodir
+        self.lazy = lazy  # If True, glifs are only read when first accessed
+        self.scan = scan  # If True, glifs are read into read-only UglifRecords with scanGlif() and the font can't be written
+        if lazy and scan: self.logger.log("Ufont can't be opened in both lazy and scan modes", "X")
         logger.log('Reading UFO: ' + ufodir, 'P')
         if not os.path.isdir(ufodir):
             logger.log(ufodir + " is not a directory", "S")
@@ -268,6 +339,18 @@ class Ufont(object):
 
         self.metacheck = True if cf in ("check", "fix") else False
         self.metafix = True if cf == "fix" else False
+
+        # Parser for scanGlif()
+        xmlparser = self.paramset["xmlparser"].lower()
+        if xmlparser not in ("auto", "lxml", "etree"): logger.log("Invalid value '" + xmlparser + "' for xmlparser parameter", "S")
+        if not ETU.setreadonlyparser(xmlparser): logger.log("xmlparser is set to lxml but lxml is not installed", "S")
+
+        # Set up cache of scanGlif() records if in scan mode
+        cache = self.paramset["cache"].lower()
+        if cache not in ("on", "off"): logger.log("Invalid value '" + cache + "' for cache parameter", "S")
+        self.scancache = UscanCache(self) if scan and cache == "on" else None
+        # Record of files normalised by a previous write, used to skip unchanged files when writing in place
+        self.manifest = UwriteManifest(ufodir, self.paramset, logger) if cache == "on" and not scan else None
         if "fontinfo.plist" not in self.dtree:
             logger.log("fontinfo.plist missing so checkfix routines can't be run", "E")
             self.metacheck = False
@@ -296,19 +379,32 @@ class Ufont(object):
             layername = self.layercontents[i][0].text
             layerdir = self.layercontents[i][1].text
             logger.log("Processing Glyph Layer " + str(i) + ": " + layername + layerdir, "I")
-            layer = Ulayer(layername, layerdir, self)
+            with params.timer.phase("parse layer " + layername):
+                layer = Ulayer(layername, layerdir, self)
             if layer:
                 self.layers.append(layer)
                 if layername == "public.default": self.deflayer = layer
             else:
                 logger.log("Glyph directory " + layerdir + " missing", "S")
         if self.deflayer is None: logger.log("No public.default layer", "S")
+        if self.scancache: self.scancache.save()
         # Process other directories
         if "images" in self.dtree:
             self.images = Udirectory(self,ufodir, "images")
         if "data" in self.dtree:
             self.data = Udirectory(self, ufodir, "data")
 
+        # Fingerprint plists that were normalised by a previous write before anything can change them
+        if self.manifest:
+            plists = [(filen, getattr(self, attr, None)) for (filen, attr) in (("metainfo.plist", "metainfo"),
+                ("fontinfo.plist", "fontinfo"), ("groups.plist", "groups"), ("kerning.plist", "kerning"),
+                ("lib.plist", "lib"), ("layercontents.plist", "layercontents"))]
+            for layer in self.layers:
+                plists.append((os.path.join(layer.layerdir, "contents.plist"), layer.contents))
+                if "layerinfo" in layer.__dict__: plists.append((os.path.join(layer.layerdir, "layerinfo.plist"), layer.layerinfo))
+            for (relpath, plist) in plists:
+                if plist is not None and relpath in self.manifest.files: plist.fingerprint = fingerprint(plist)
+
         # Run best practices check and fix routines
         if self.metacheck:
             initwarnings = logger.warningcount
@@ -526,6 +622,7 @@ class Ufont(object):
 
     def write(self, outdir):
         # Write UFO out to disk, based on values set in self.outparams
+        if self.scan: self.logger.log("Fonts opened in scan mode can't be written", "X")
         self.logger.log("Processing font for output", "P")
         if not os.path.exists(outdir):
             try:
@@ -576,13 +673,54 @@ class Ufont(object):
 
         self.logger.log("Writing font to " + outdir, "P")
 
-        changes = writeToDisk(dtree, outdir, self, odtree)
+        # Files that were normalised by a previous write and are unchanged since can be skipped when writing in place
+        self.inplace = outdir == self.ufodir
+        self.outdir = outdir
+        self.outsignature = outSignature(self.outparams)
+        self.normalised = {}  # Hashes of files written (or skipped) by writeToDisk that are normalised with outparams
+        # Manifest for the output location, so existing files can be compared by hash rather than by reading them
+        if self.paramset["cache"].lower() != "on":
+            self.outmanifest = None
+            manifestn = manifestFile(outdir, self.paramset)
+            if os.path.isfile(manifestn):  # Left by a run with cache on, and would be out of date after this write
+                try:
+                    os.remove(manifestn)
+                except OSError as e:
+                    self.logger.log("Unable to remove out of date manifest " + manifestn + ": " + str(e), "W")
+        elif self.inplace:
+            self.outmanifest = self.manifest
+        else:
+            self.outmanifest = UwriteManifest(outdir, self.paramset, self.logger, read=bool(odtree))
+
+        # With multiple workers, glifs are serialised and written by a pool of processes
+        workers = int(self.paramset["workers"])
+        pool = None
+        if workers > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(workers, UT.setopenlimit, (openLimit(self.paramset),))
+        changes = writeToDisk(dtree, outdir, self, odtree, pool=pool)
+        if pool:
+            pool.close()
+            pool.join()
         if changes: # Need to update openTypeHeadCreated if there have been any changes to the font
             if "fontinfo" in self.__dict__:
                 self.fontinfo.setval("openTypeHeadCreated", "string",
                                      datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S"))
-                self.fontinfo.outxmlstr="" # Need to reset since writeXMLobject has already run once
                 writeXMLobject(self.fontinfo, self.outparams, outdir, "fontinfo.plist", True, fobject=True)
+                fontinfon = os.path.join(outdir, "fontinfo.plist")
+                if fontinfon in self.normalised: self.normalised[fontinfon] = xmlHash(self.fontinfo.outxmlstr)
+        if self.outmanifest:
+            self.outmanifest.save(self.outsignature,
+                                  {os.path.relpath(filen, outdir): self.normalised[filen] for filen in self.normalised})
+
+    def unchanged(self, object, relpath, stamp=None):
+        # True if object is unchanged since read and its file was last written with the current outparams, so it
+        # does not need serialising again when writing in place.  stamp is the file's (mtime, size) if already known
+        if not self.inplace or self.manifest is None or object.outparams or \
+                not self.manifest.normalised(relpath, self.outsignature, stamp):
+            return False
+        if object.type == "glif" and object.layer._unaccessed.get(object.name) == object.filen: return True
+        return object.fingerprint is not None and object.fingerprint == fingerprint(object)
 
     def addfile(self, filetype):  # Add empty plist file for optional files
         if filetype not in ("fontinfo", "groups", "kerning", "lib"): self.logger.log("Invalid file type to add", "X")
@@ -629,17 +767,67 @@ class Ulayer(_Ucontainer):
                 self.layerinfo = Uplist(font=font, dirn=fulldir, filen="layerinfo.plist")
                 self.dtree["layerinfo.plist"].setinfo(read=True, fileObject=self.layerinfo, fileType="xml")
 
-        for glyphn in sorted(self.contents.keys()):
+        glyphns = sorted(self.contents.keys())
+        # Case-insensitive glif file names in use, without .glif, so new names can be checked against it
+        self._glifnames = set(_glifKey(self.contents[glyphn][1].text) for glyphn in glyphns)
+        self._indexes = None  # Built by _index() when first needed
+        self._indexkeys = None  # Keys each glyph is in the indexes under, so entries can be removed
+        self._unaccessed = {}  # Glyphs read from disk but not yet accessed by a script, with their glif file names
+        for glyphn in glyphns:
             glifn = self.contents[glyphn][1].text
-            if glifn in self.dtree:
-                glyph = Uglif(layer=self, filen=glifn)
+            if glifn not in self.dtree: self.font.logger.log("Missing glif " + glifn + " in " + fulldir, "S")
+        if font.scan:  # Just collect basic glyph data
+            for glyphn in glyphns:
+                glifn = self.contents[glyphn][1].text
+                fulln = os.path.join(fulldir, glifn)
+                if font.scancache:
+                    self._contents[glyphn] = font.scancache.scanGlif(fulln, os.path.join(layerdir, glifn),
+                                                                     self.dtree[glifn].stamp)
+                else:
+                    self._contents[glyphn] = scanGlif(fulln, font.UFOversion)
+                self.dtree[glifn].setinfo(read=True)
+        elif font.lazy:  # Glifs will be read by __getitem__ when first accessed
+            for glyphn in glyphns:
+                glifn = self.contents[glyphn][1].text
+                glyph = UlazyGlif(self, glifn)
                 self._contents[glyphn] = glyph
-                self.dtree[glifn].setinfo(read=True, fileObject=glyph, fileType="xml")
-                if glyph.name != glyphn:
-                    super(Uglif, glyph).__setattr__("name", glyphn)  # Need to use super to bypass normal glyph renaming logic
-                    self.font.logger.log("Glyph names in glif and contents.plist did not match for " + glyphn + "; corrected", "W")
-            else:
-                self.font.logger.log("Missing glif " + glifn + " in " + fulldir, "S")
+                self.dtree[glifn].setinfo(read=True, fileObject=glyph, fileType="lazy")
+        else:
+            # With multiple workers, glif files are read and parsed in a pool then the Uglif objects created in order
+            workers = int(font.paramset["workers"])
+            inxmls = None
+            if workers > 1:
+                from multiprocessing.dummy import Pool as ThreadPool
+                UT.setopenlimit(openLimit(font.paramset, threads=True))  # Threads share the limit
+                pool = ThreadPool(workers)
+                inxmls = pool.map(ETU.readxml, [os.path.join(fulldir, self.contents[glyphn][1].text) for glyphn in glyphns])
+                pool.close()
+                pool.join()
+                UT.setopenlimit(None)
+            for i, glyphn in enumerate(glyphns):
+                self._readGlif(glyphn, self.contents[glyphn][1].text, inxmls[i] if inxmls else None)
+                self._unaccessed[glyphn] = self._contents[glyphn].filen
+
+    def __getitem__(self, key):
+        glyph = self._contents[key]
+        if isinstance(glyph, UlazyGlif): glyph = self._readGlif(key, glyph.filen)
+        if key in self._unaccessed:  # Fingerprint so changes can be detected when writing
+            del self._unaccessed[key]
+            manifest = self.font.manifest
+            if manifest and os.path.join(self.layerdir, glyph.filen) in manifest.files: glyph.fingerprint = fingerprint(glyph)
+        return glyph
+
+    def __contains__(self, key):
+        return key in self._contents
+
+    def _readGlif(self, glyphn, glifn, inxml=None):
+        glyph = Uglif(layer=self, filen=glifn, inxml=inxml)
+        self._contents[glyphn] = glyph
+        self.dtree[glifn].setinfo(read=True, fileObject=glyph, fileType="xml")
+        if glyph.name != glyphn:
+            super(Uglif, glyph).__setattr__("name", glyphn)  # Need to use super to bypass normal glyph renaming logic
+            self.font.logger.log("Glyph names in glif and contents.plist did not match for " + glyphn + "; corrected", "W")
+        return glyph
 
     def setForOutput(self):
 
@@ -652,22 +840,31 @@ class Ulayer(_Ucontainer):
         if "layerinfo" in self.__dict__ and UFOversion == "3":
             setFileForOutput(dtree, "layerinfo.plist", self.layerinfo, "xml")
 
+        # Unread glifs can only be copied unchanged if they are already in the output glif format
+        passthrough = convertg2f1 == (self.font.UFOversion == "2")
         for glyphn in self:
             glyph = self._contents[glyphn]
+            if isinstance(glyph, UlazyGlif):
+                if passthrough:
+                    setFileForOutput(dtree, glyph.filen, glyph, "lazy")
+                    continue
+                glyph = self[glyphn]
             if convertg2f1: glyph.convertToFormat1()
             setFileForOutput(dtree, glyph.filen, glyph, "xml")
 
     def renameGlifs(self):
-        namelist = []
+        namelist = set()
         for glyphn in sorted(self.keys()):
             glyph = self._contents[glyphn]
             filename = makeFileName(glyphn, namelist)
-            namelist.append(filename.lower())
+            namelist.add(filename.lower())
             filename += ".glif"
             if filename != glyph.filen:
                 self.renameGlif(glyphn, glyph, filename)
+        self._glifnames = namelist
 
     def renameGlif(self, glyphn, glyph, newname):
+        if isinstance(glyph, UlazyGlif): glyph = self[glyphn]  # Must be read before the original glif is removed from disk
         self.font.logger.log("Renaming glif for " + glyphn + " from " + glyph.filen + " to " + newname, "I")
         self.dtree.removedfiles[glyph.filen] = newname  # Track so original glif does not get reported as invalid
         glyph.filen = newname
@@ -677,22 +874,265 @@ class Ulayer(_Ucontainer):
         glyphn = glyph.name
         if glyphn in self._contents: self.font.logger.log(glyphn + " already in font", "X")
         self._contents[glyphn] = glyph
-        # Set glif name
-        glifn = makeFileName(glyphn)
-        names = []
-        while glifn in self.contents:  # need to check for duplicate glif names
-            names.append(glfin)
-            glifn = makeFileName(glyphn, names)
-        glifn += ".glif"
+        glifn = self._newGlifName(glyphn)
         glyph.filen = glifn
         # Add to contents.plist and dtree
         self.contents.addval(glyphn, "string", glifn)
         self.dtree[glifn] = UT.dirTreeItem(read=False, added=True, fileObject=glyph, fileType="xml")
+        if self._indexes is not None: self._indexGlyph(glyphn)
 
     def delGlyph(self, glyphn):
-        self.dtree.removedfiles[self[glyphn].filen] = "deleted"  # Track so original glif does not get reported as invalid
-        del self._contents[glyphn]
-        self.contents.remove(glyphn)
+        self.delGlyphs([glyphn])
+
+    def delGlyphs(self, glyphns):  # Delete several glyphs, updating contents.plist in a single pass
+        glyphns = list(glyphns)
+        for glyphn in glyphns:
+            self.dtree.removedfiles[self._contents[glyphn].filen] = "deleted"  # Track so original glif does not get reported as invalid
+            self._glifnames.discard(_glifKey(self._contents[glyphn].filen))
+            del self._contents[glyphn]
+            if glyphn in self._unaccessed: del self._unaccessed[glyphn]
+            if self._indexes is not None: self._unindexGlyph(glyphn)
+        self.contents.removekeys(glyphns)
+
+    def _newGlifName(self, glyphn):  # Make a glif file name for glyphn that is not already used in the layer
+        glifn = makeFileName(glyphn, self._glifnames)
+        self._glifnames.add(glifn.lower())
+        return glifn + ".glif"
+
+    def setGlifLibs(self, key, values, valuetype="string"):
+        # Bulk update of a glif lib key.  values is a dict of glyph name to value (or to an element for arrays or dicts).
+        # The key is set for those glyphs and removed from all others.  Returns a list of glyphs it was removed from
+        for glyphn in values:
+            glyph = self[glyphn]
+            if glyph["lib"] is None: glyph.add("lib")
+            value = values[glyphn]
+            if ET.iselement(value):
+                glyph["lib"].setelem(key, value)
+            else:
+                glyph["lib"].setval(key, valuetype, value)
+        removed = []
+        for glyphn in sorted(self._contents):
+            if glyphn in values: continue
+            glyph = self[glyphn]
+            if glyph["lib"] is not None and key in glyph["lib"]:
+                glyph["lib"].remove(key)
+                removed.append(glyphn)
+        return removed
+
+    # Indexes of glyphs by unicode value, component base and anchor name.  These are built the first time one of the
+    # lookup methods below is used, then kept up to date as glyphs are added, deleted and renamed and as unicodes,
+    # components and anchors are changed using the U* objects.  If glif elements are changed directly, call
+    # updateIndexes() afterwards.
+
+    def unicodeGlyphs(self, usv):  # Sorted list of names of glyphs with the unicode value, given as integer or hex string
+        if isinstance(usv, basestring): usv = int(usv, 16)
+        return sorted(self._index("unicode").get(usv, ()))
+
+    def componentUsers(self, base):  # Sorted list of names of glyphs that use base as a component
+        return sorted(self._index("component").get(base, ()))
+
+    def anchorGlyphs(self, anchorn):  # Sorted list of names of glyphs with an anchor called anchorn
+        return sorted(self._index("anchor").get(anchorn, ()))
+
+    def cmap(self):  # Dict of unicode values (as integers) to glyph names, using the first name if several glyphs share a value
+        return {usv: min(glyphns) for (usv, glyphns) in self._index("unicode").items()}
+
+    # The component index also gives a dependency graph for the layer's composite glyphs
+
+    def componentBases(self, glyphn):  # Sorted list of names of glyphs that glyphn uses as components
+        self._index("component")
+        return sorted(set(self._indexkeys[glyphn][1]))
+
+    def componentClosure(self, glyphns, users=False):
+        # Set of the glyphs plus all the glyphs they use as components, directly or through other composites, or with
+        # users=True, plus all the glyphs that use them.  Base names for glyphs not in the layer are included as found
+        compindex = self._index("component")
+        closure = set()
+        todo = list(glyphns)
+        while todo:
+            glyphn = todo.pop()
+            if glyphn in closure: continue
+            closure.add(glyphn)
+            if users:
+                todo.extend(compindex.get(glyphn, ()))
+            elif glyphn in self._indexkeys:
+                todo.extend(self._indexkeys[glyphn][1])
+        return closure
+
+    def componentOrder(self, glyphns=None):
+        # Names of glyphs (default all in the layer) ordered so each comes after any glyphs it uses as components
+        self._index("component")
+        glyphns = sorted(self._contents if glyphns is None else glyphns)
+        wanted = set(glyphns)
+        order = []
+        state = {}  # 1 while a glyph's bases are being visited, 2 once done
+        for glyphn in glyphns:
+            if glyphn in state: continue
+            state[glyphn] = 1
+            stack = [(glyphn, iter(self.componentBases(glyphn) if glyphn in self._indexkeys else ()))]
+            while stack:
+                (current, bases) = stack[-1]
+                for base in bases:
+                    if base not in self._indexkeys or state.get(base) == 2: continue
+                    if state.get(base) == 1:
+                        self.font.logger.log("Circular component reference from " + current + " to " + base, "E")
+                        continue
+                    state[base] = 1
+                    stack.append((base, iter(self.componentBases(base))))
+                    break
+                else:
+                    stack.pop()
+                    state[current] = 2
+                    if current in wanted: order.append(current)
+        return order
+
+    def updateIndexes(self, glyph):  # Update the indexes after a glyph's unicodes, components or anchors have changed
+        if self._indexes is None or self._contents.get(glyph.name) is not glyph: return  # Nothing indexed yet
+        self._unindexGlyph(glyph.name)
+        self._indexGlyph(glyph.name)
+
+    def _index(self, indexn):
+        if self._indexes is None:
+            self._indexes = {name: {} for name in _indexNames}
+            self._indexkeys = {}
+            for glyphn in self._contents: self._indexGlyph(glyphn)
+        return self._indexes[indexn]
+
+    def _indexGlyph(self, glyphn):
+        glyph = self._contents[glyphn]
+        if isinstance(glyph, UlazyGlif):  # Scan the glif rather than reading it fully
+            glyph = scanGlif(os.path.join(self.font.ufodir, self.layerdir, glyph.filen), self.font.UFOversion)
+        keys = _indexKeys(glyph)
+        self._indexkeys[glyphn] = keys
+        for (indexn, values) in zip(_indexNames, keys):
+            index = self._indexes[indexn]
+            for value in values:
+                if value in index:
+                    index[value].add(glyphn)
+                else:
+                    index[value] = set([glyphn])
+
+    def _unindexGlyph(self, glyphn):
+        keys = self._indexkeys.pop(glyphn, None)
+        if keys is None: return
+        for (indexn, values) in zip(_indexNames, keys):
+            index = self._indexes[indexn]
+            for value in values:
+                glyphns = index.get(value)
+                if glyphns is None: continue
+                glyphns.discard(glyphn)
+                if not glyphns: del index[value]
+
+    def geometry(self, glyphs=None):  # Ugeometry object for the listed glyphs, or all glyphs in the layer
+        if self.font.scan: self.font.logger.log("Geometry can't be changed in fonts opened in scan mode", "X")
+        return Ugeometry(self, glyphs)
+
+    def transform(self, xx=1, xy=0, yx=0, yy=1, dx=0, dy=0, glyphs=None):  # Returns list of names of changed glyphs
+        geometry = self.geometry(glyphs)
+        geometry.transform(xx, xy, yx, yy, dx, dy)
+        return geometry.apply()
+
+    def roundcoords(self, digits=0, glyphs=None):  # Returns list of names of changed glyphs
+        geometry = self.geometry(glyphs)
+        geometry.round(digits)
+        return geometry.apply()
+
+
+class Ugeometry(object):
+    # Coordinates of contour points and anchors, and component transformations, for glyphs in a layer, gathered into
+    # contiguous arrays so changes can be made to all the glyphs with single calls.  x, y, cx and cy (component offsets)
+    # are NumPy arrays if NumPy is installed, otherwise array module arrays.  The glifs are only updated by apply().
+
+    def __init__(self, layer, glyphs=None):
+        self.layer = layer
+        self.numpy = _importNumpy()
+        self._contours = []    # (glyph name, Upoints, start, end) for each contour, with its slice of x and y
+        self._anchors = []     # (glyph name, Uanchor, index) for each anchor, with its index in x and y
+        self._components = []  # (glyph name, Ucomponent, matrix) for each component, in the same order as cx and cy
+        (x, y, cx, cy) = (array('d'), array('d'), array('d'), array('d'))
+        for glyphn in (sorted(layer.keys()) if glyphs is None else glyphs):
+            glyph = layer[glyphn]
+            try:
+                if glyph["outline"] is not None:
+                    for contour in glyph["outline"].contours:
+                        points = contour.points
+                        self._contours.append((glyphn, points, len(x), len(x) + len(points)))
+                        x.extend(points.x)
+                        y.extend(points.y)
+                    for component in glyph["outline"].components:
+                        values = [float(component.element.get(attrn, default)) for (attrn, default) in _compAttribs]
+                        self._components.append((glyphn, component, values[0:4]))
+                        cx.append(values[4])
+                        cy.append(values[5])
+                for anchor in glyph["anchor"]:
+                    self._anchors.append((glyphn, anchor, len(x)))
+                    x.append(float(anchor.element.attrib["x"]))
+                    y.append(float(anchor.element.attrib["y"]))
+            except (KeyError, ValueError) as e:
+                layer.font.logger.log("Invalid anchor or component in glyph " + glyphn + ": " + str(e), "S")
+        if self.numpy: (x, y, cx, cy) = [self.numpy.array(a, dtype=float) for a in (x, y, cx, cy)]
+        (self.x, self.y, self.cx, self.cy) = (x, y, cx, cy)
+
+    def transform(self, xx=1, xy=0, yx=0, yy=1, dx=0, dy=0):
+        # Apply an affine transformation to all the glyphs.  Component transformations are changed so that composites
+        # still match their (transformed) base glyphs
+        (x, y, cx, cy) = (self.x, self.y, self.cx, self.cy)
+        if self.numpy:
+            (self.x, self.y) = (xx * x + yx * y + dx, xy * x + yy * y + dy)
+            (self.cx, self.cy) = (xx * cx + yx * cy, xy * cx + yy * cy)
+        else:
+            self.x = array('d', [xx * a + yx * b + dx for (a, b) in zip(x, y)])
+            self.y = array('d', [xy * a + yy * b + dy for (a, b) in zip(x, y)])
+            self.cx = array('d', [xx * a + yx * b for (a, b) in zip(cx, cy)])
+            self.cy = array('d', [xy * a + yy * b for (a, b) in zip(cx, cy)])
+        det = float(xx * yy - xy * yx)
+        for i, (glyphn, component, matrix) in enumerate(self._components):
+            if matrix == [1, 0, 0, 1]: continue
+            if det == 0: self.layer.font.logger.log("Transformation can't be applied to scaled components since it can't be inverted", "S")
+            (ixx, ixy, iyx, iyy) = (yy / det, -xy / det, -yx / det, xx / det)  # Inverse of the transformation
+            # New matrix is T.M.inverse(T) and the offset needs adjusting by (I - new matrix).(dx, dy)
+            (a, b, c, d) = matrix
+            (ma, mb, mc, md) = (xx * a + yx * b, xy * a + yy * b, xx * c + yx * d, xy * c + yy * d)
+            matrix[:] = [ma * ixx + mc * ixy, mb * ixx + md * ixy, ma * iyx + mc * iyy, mb * iyx + md * iyy]
+            (a, b, c, d) = matrix
+            self.cx[i] += dx - (a * dx + c * dy)
+            self.cy[i] += dy - (b * dx + d * dy)
+
+    def round(self, digits=0):  # Round coordinates and component offsets, with halves rounded away from zero
+        if self.numpy:
+            np = self.numpy
+            factor = 10.0 ** digits
+            (self.x, self.y, self.cx, self.cy) = [np.sign(a) * np.floor(np.abs(a) * factor + 0.5) / factor
+                                                  for a in (self.x, self.y, self.cx, self.cy)]
+        else:
+            (self.x, self.y, self.cx, self.cy) = [array('d', [round(v, digits) for v in a])
+                                                  for a in (self.x, self.y, self.cx, self.cy)]
+
+    def apply(self):  # Update the glifs with any changes, and return a sorted list of names of glyphs that have changed
+        (x, y, cx, cy) = (self.x, self.y, self.cx, self.cy)
+        if self.numpy: (x, y, cx, cy) = [array('d', a.tolist()) for a in (x, y, cx, cy)]
+        changed = set()
+        for (glyphn, points, start, end) in self._contours:
+            (px, py) = (x[start:end], y[start:end])
+            if px != points.x or py != points.y:
+                (points.x, points.y) = (px, py)
+                changed.add(glyphn)
+        for (glyphn, anchor, i) in self._anchors:
+            element = anchor.element
+            if x[i] != float(element.attrib["x"]) or y[i] != float(element.attrib["y"]):
+                element.set("x", _numstr(x[i]))
+                element.set("y", _numstr(y[i]))
+                changed.add(glyphn)
+        for i, (glyphn, component, matrix) in enumerate(self._components):
+            element = component.element
+            for (attrn, default), value in zip(_compAttribs, matrix + [cx[i], cy[i]]):
+                if value != float(element.get(attrn, default)):
+                    if value == default:
+                        del element.attrib[attrn]
+                    else:
+                        element.set(attrn, _numstr(value))
+                    changed.add(glyphn)
+        return sorted(changed)
 
 
 class Uplist(ETU.xmlitem, _plist):
@@ -703,6 +1143,7 @@ class Uplist(ETU.xmlitem, _plist):
         self.type = "plist"
         self.font = font
         self.outparams = None
+        self.fingerprint = None  # Set if needed to detect changes when writing - see Ufont.unchanged()
         if filen and dirn: self.populate_dict()
 
     def populate_dict(self):
@@ -720,14 +1161,15 @@ class Uplist(ETU.xmlitem, _plist):
 class Uglif(ETU.xmlitem):
     # Unlike plists, glifs can have multiples of some sub-elements (eg anchors) so create lists for those
 
-    def __init__(self, layer, filen=None, parse=True, name=None, format=None):
+    def __init__(self, layer, filen=None, parse=True, name=None, format=None, inxml=None):
         dirn = os.path.join(layer.font.ufodir, layer.layerdir)
-        ETU.xmlitem.__init__(self, dirn, filen, parse, layer.font.logger)  # Will read item from file if dirn and filen both present
+        ETU.xmlitem.__init__(self, dirn, filen, parse, layer.font.logger, inxml)  # Will read item from file if dirn and filen both present
         self.type = "glif"
         self.layer = layer
         self.format = format if format else '2'
         self.name = name
         self.outparams = None
+        self.fingerprint = None  # Set if needed to detect changes when writing - see Ufont.unchanged()
         self.glifElemOrder = self.layer.font.outparams["glifElemOrder"]
         # Set initial values for sub-objects
         for elem in self.glifElemOrder:
@@ -744,20 +1186,19 @@ class Uglif(ETU.xmlitem):
             # Update the _contents disctionary
             del self.layer._contents[oname]
             self.layer._contents[value] = self
-            # Set glif name
-            glifn = makeFileName(value)
-            names = []
-            while glifn in self.layer.contents:  # need to check for duplicate glif names
-                names.append(glifn)
-                glifn = makeFileName(value, names)
-            glifn += ".glif"
+            self.layer._glifnames.discard(_glifKey(self.filen))  # So the glyph's own file name can be re-used
+            glifn = self.layer._newGlifName(value)
 
             # Update to contents.plist, filen and dtree
-            self.layer.contents.remove(oname)
-            self.layer.contents.addval(value, "string", glifn)
-            self.layer.dtree.removedfiles[self.filen] = glifn  # Track so original glif does not get reported as invalid
+            self.layer.contents.rename(oname, value)
+            self.layer.contents.setval(value, "string", glifn)
+            if glifn != self.filen:  # Track so original glif does not get reported as invalid
+                self.layer.dtree.removedfiles[self.filen] = glifn
             self.filen = glifn
             self.layer.dtree[glifn] = UT.dirTreeItem(read=False, added=True, fileObject=self, fileType="xml")
+            if self.layer._indexes is not None:
+                self.layer._unindexGlyph(oname)
+                self.layer._indexGlyph(value)
         super(Uglif, self).__setattr__(name, value)
 
     def process_etree(self):
@@ -791,6 +1232,7 @@ class Uglif(ETU.xmlitem):
         self.format = "2"
 
     def rebuildET(self):
+        if self._contents["outline"] is not None: self._contents["outline"].syncpoints()
         self.etree = ET.Element("glyph")
         et = self.etree
         et.attrib["name"] = self.name
@@ -825,6 +1267,7 @@ class Uglif(ETU.xmlitem):
             self._contents[ename].append(self.makeObject(ename, element))
         else:
             self._contents[ename] = self.makeObject(ename, element)
+        if ename in ("unicode", "outline", "anchor"): self.layer.updateIndexes(self)
 
     def remove(self, ename, index=None, object=None):
         # Remove object from a glif
@@ -836,6 +1279,7 @@ class Uglif(ETU.xmlitem):
             del item[index]
         else:
             self._contents[ename] = None
+        if ename in ("unicode", "outline", "anchor"): self.layer.updateIndexes(self)
 
     def convertToFormat1(self):
         # Convert to a glif format of 1 (for UFO2) prior to writing out
@@ -864,6 +1308,8 @@ class Uglif(ETU.xmlitem):
 
 
 class Uadvance(Uelement):
+    __slots__ = ("glif", "width", "height")
+
     def __init__(self, glif, element):
         super(Uadvance, self).__init__(element)
         self.glif = glif
@@ -884,6 +1330,8 @@ class Uadvance(Uelement):
 
 
 class Uunicode(Uelement):
+    __slots__ = ("glif", "hex")
+
     def __init__(self, glif, element):
         super(Uunicode, self).__init__(element)
         self.glif = glif
@@ -896,49 +1344,60 @@ class Uunicode(Uelement):
     def __setattr__(self, name, value):
         if name == "hex": self.element.attrib['hex'] = value
         super(Uunicode, self).__setattr__(name, value)
+        if name == "hex": self.glif.layer.updateIndexes(self.glif)
 
 
 class Unote(Uelement):
+    __slots__ = ("glif",)
+
     def __init__(self, glif, element):
         self.glif = glif
         super(Unote, self).__init__(element)
 
 
 class Uimage(Uelement):
+    __slots__ = ("glif",)
+
     def __init__(self, glif, element):
         self.glif = glif
         super(Uimage, self).__init__(element)
 
 
 class Uguideline(Uelement):
+    __slots__ = ("glif",)
+
     def __init__(self, glif, element):
         self.glif = glif
         super(Uguideline, self).__init__(element)
 
 
 class Uanchor(Uelement):
+    __slots__ = ("glif",)
+
     def __init__(self, glif, element):
         self.glif = glif
         super(Uanchor, self).__init__(element)
 
 
 class Uoutline(Uelement):
+    __slots__ = ("glif", "components", "contours")
+
     def __init__(self, glif, element):
         super(Uoutline, self).__init__(element)
         self.glif = glif
         self.components = []
         self.contours = []
-        for tag in self._contents:
-            if tag == "component":
-                for component in self._contents[tag]:
-                    self.components.append(Ucomponent(self, component))
-            if tag == "contour":
-                for contour in self._contents[tag]:
-                    self.contours.append(Ucontour(self, contour))
+        for subelement in element:
+            if subelement.tag == "component":
+                self.components.append(Ucomponent(self, subelement))
+            elif subelement.tag == "contour":
+                self.contours.append(Ucontour(self, subelement))
 
     def removeobject(self, obj, typ):
         super(Uoutline, self).remove(obj.element)
-        if typ == "component": self.components.remove(obj)
+        if typ == "component":
+            self.components.remove(obj)
+            self.glif.layer.updateIndexes(self.glif)
         if typ == "contour": self.contours.remove(obj)
 
     def appendobject(self, item, typ): # Item can be an contour/component object, element or attribute list
@@ -957,8 +1416,13 @@ class Uoutline(Uelement):
             else:
                 obj = Ucontour(self,elem)
         super(Uoutline, self).append(obj.element)
-        if type == "component": self.components.append(obj)
-        if type == "contour": self.contours.append(obj)
+        if typ == "component":
+            self.components.append(obj)
+            self.glif.layer.updateIndexes(self.glif)
+        if typ == "contour": self.contours.append(obj)
+
+    def syncpoints(self):  # Update point elements from any packed points that have been changed
+        for contour in self.contours: contour.syncpoints()
 
     def insertobject(self, index, item, typ): # Needs updating to match appendobject
         self.logger.log("insertobject currently buggy so don't use!", "X")
@@ -971,25 +1435,125 @@ class Uoutline(Uelement):
 
 
 class Ucomponent(Uelement):
+    __slots__ = ("outline",)
+
     def __init__(self, outline, element):
         super(Ucomponent, self).__init__(element)
         self.outline = outline
 
+    @property
+    def base(self):
+        return self.element.get("base")
+
+    @base.setter
+    def base(self, value):
+        self.element.set("base", value)
+        glif = self.outline.glif
+        glif.layer.updateIndexes(glif)
+
 
 class Ucontour(Uelement):
+    __slots__ = ("outline", "UFO2anchor", "_points")
+
     def __init__(self, outline, element):
         super(Ucontour, self).__init__(element)
         self.outline = outline
         self.UFO2anchor = None
-        points = self._contents['point']
         # Identify UFO2-style anchor points
-        if len(points) == 1 and "type" in points[0].attrib:
-            if points[0].attrib["type"] == "move":
-                if "name" in points[0].attrib:
-                    self.UFO2anchor = points[0].attrib
+        if len(element) == 1 and element[0].tag == "point" and "type" in element[0].attrib:
+            if element[0].attrib["type"] == "move":
+                if "name" in element[0].attrib:
+                    self.UFO2anchor = element[0].attrib
                 else:
                     self.outline.glif.layer.font.logger.log(
                         "Glyph " + self.outline.glif.name + " contains a single-point contour with no anchor name", "E")
+        self._points = None
+
+    @property
+    def points(self):  # Packed form of the points, created when first used
+        if self._points is None: self._points = Upoints(self)
+        return self._points
+
+    def syncpoints(self):
+        if self._points is not None: self._points.update()
+
+
+class Upoints(object):
+    # Packed numeric form of a contour's points, for geometry work without accessing point elements and parsing values.
+    # x and y are arrays of doubles.  types is an array of indexes into pointTypes, with 0 for points with no type
+    # attribute, and smooth an array of 1 for smooth="yes", otherwise 0.  The arrays can be changed in place, and
+    # update() (called by Uglif.rebuildET() and before checking if a glif has changed) then updates just the attributes
+    # that have changed in the point elements.
+    pointTypes = (None, "move", "line", "offcurve", "curve", "qcurve")
+    _typeCodes = dict((ptype, i) for (i, ptype) in enumerate(pointTypes))
+
+    def __init__(self, contour):
+        self.contour = contour
+        elements = contour._contents['point']
+        try:
+            self.x = array('d', [float(e.attrib["x"]) for e in elements])
+            self.y = array('d', [float(e.attrib["y"]) for e in elements])
+            self.types = array('b', [self._typeCodes[e.get("type")] for e in elements])
+        except (KeyError, ValueError) as err:
+            glif = contour.outline.glif
+            glif.layer.font.logger.log("Invalid point in glyph " + glif.name + ": " + str(err), "S")
+        self.smooth = array('b', [e.get("smooth") == "yes" for e in elements])
+        self._original = self._copy()  # Used by update() to see what has changed
+
+    def _copy(self):
+        return (self.x[:], self.y[:], self.types[:], self.smooth[:])
+
+    def __len__(self):
+        return len(self.x)
+
+    def __iter__(self):  # (x, y, type, smooth) for each point
+        for (x, y, code, smooth) in zip(self.x, self.y, self.types, self.smooth):
+            yield (x, y, self.pointTypes[code], bool(smooth))
+
+    def bounds(self):  # (xMin, yMin, xMax, yMax) of the points, so the control box of the contour
+        if not self.x: return None
+        return (min(self.x), min(self.y), max(self.x), max(self.y))
+
+    def transform(self, xx=1, xy=0, yx=0, yy=1, dx=0, dy=0):  # Apply affine transformation, as for components
+        (x, y) = (self.x, self.y)
+        if xy == 0 and yx == 0:
+            self.x = array('d', [xx * v + dx for v in x])
+            self.y = array('d', [yy * v + dy for v in y])
+        else:
+            self.x = array('d', [xx * a + yx * b + dx for (a, b) in zip(x, y)])
+            self.y = array('d', [xy * a + yy * b + dy for (a, b) in zip(x, y)])
+
+    def asarray(self):  # Coordinates as an n x 2 NumPy array, if NumPy is installed.  Use setcoords() to apply changes
+        import numpy
+        return numpy.column_stack((numpy.array(self.x), numpy.array(self.y)))
+
+    def setcoords(self, coords):  # Set coordinates from a sequence of (x, y) pairs, eg as returned by asarray()
+        if len(coords) != len(self.x): self.contour.outline.glif.layer.font.logger.log("Number of points can't be changed", "X")
+        self.x = array('d', [float(c[0]) for c in coords])
+        self.y = array('d', [float(c[1]) for c in coords])
+
+    def update(self):  # Update point elements with any changes.  Returns True if any changes were made
+        current = (self.x, self.y, self.types, self.smooth)
+        if current == self._original: return False
+        elements = self.contour._contents['point']
+        if set(len(a) for a in current) != set([len(elements)]):
+            self.contour.outline.glif.layer.font.logger.log("Number of points can't be changed", "X")
+        (ox, oy, otypes, osmooth) = self._original
+        for i, element in enumerate(elements):
+            if self.x[i] != ox[i]: element.set("x", _numstr(self.x[i]))
+            if self.y[i] != oy[i]: element.set("y", _numstr(self.y[i]))
+            if self.types[i] != otypes[i]:
+                if self.types[i]:
+                    element.set("type", self.pointTypes[self.types[i]])
+                else:
+                    del element.attrib["type"]
+            if self.smooth[i] != osmooth[i]:
+                if self.smooth[i]:
+                    element.set("smooth", "yes")
+                elif "smooth" in element.attrib:
+                    del element.attrib["smooth"]
+        self._original = self._copy()
+        return True
 
 
 class Ulib(_Ucontainer, _plist):
@@ -1015,7 +1579,214 @@ class UfeatureFile(UtextFile):
         super(UfeatureFile, self).__init__(font, dirn, filen)
 
 
-def writeXMLobject(dtreeitem, params, dirn, filen, exists, fobject=False):
+# Read-only glyph data returned by scanGlif().  unicodes is a list of hex strings, anchors a list of (name, x, y)
+# tuples and components a list of base glyph names.  Values are strings, as in the glif, or None if not present
+UglifRecord = collections.namedtuple("UglifRecord", "name width height unicodes anchors components psname")
+
+
+def scanGlif(fulln, UFOversion="3"):
+    # Fast alternative to Uglif for scripts that only need basic glyph data.  The glif is parsed by ETU.parsereadonly()
+    # (with lxml if it is installed) and only the elements needed are looked at, without building U* objects.  The etree
+    # is then discarded, so memory use stays low even for large fonts.  As with Uglif, UFO2-style anchors in format 1
+    # glifs are treated as anchors
+    glyph = ETU.parsereadonly(UT.readfile(fulln))
+    format = glyph.get("format")
+    oldanchors = format == "1" or (format is None and UFOversion == "2")
+    width = height = psname = None
+    unicodes = []
+    anchors = []
+    components = []
+    for elem in glyph:
+        tag = elem.tag
+        if tag == "advance":
+            width = elem.get("width")
+            height = elem.get("height")
+        elif tag == "unicode":
+            unicodes.append(elem.get("hex", ""))
+        elif tag == "anchor":
+            anchors.append((elem.get("name"), elem.get("x"), elem.get("y")))
+        elif tag == "outline":
+            for subelem in elem:
+                if subelem.tag == "component":
+                    components.append(subelem.get("base"))
+                elif oldanchors and subelem.tag == "contour" and len(subelem) == 1:
+                    point = subelem[0]
+                    if point.get("type") == "move" and "name" in point.attrib:
+                        anchors.append((point.get("name"), point.get("x"), point.get("y")))
+        elif tag == "lib" and len(elem):
+            libdict = elem[0]
+            for i in range(0, len(libdict) - 1, 2):
+                if libdict[i].text == "public.postscriptname":
+                    if libdict[i + 1].tag == "string": psname = libdict[i + 1].text
+                    break
+    return UglifRecord(glyph.get("name"), width, height, unicodes, anchors, components, psname)
+
+
+class UscanCache(object):
+    # On-disk cache of scanGlif() records for a font, so glifs that are unchanged since the last run (based on mtime and
+    # size) don't need parsing again.  Held in a single file in cachedir, which is relative to the font's parent directory
+    version = 1  # Increment if UglifRecord or scanGlif() change
+
+    def __init__(self, font):
+        self.font = font
+        ufodir = os.path.abspath(font.ufodir).rstrip(os.sep)
+        self.filen = os.path.join(os.path.dirname(ufodir), font.paramset["cachedir"], os.path.basename(ufodir) + ".scancache")
+        self.records = {}  # Records read from the cache file, keyed on glif path relative to the font
+        self.current = {}  # Records for glifs in the font now
+        if os.path.isfile(self.filen):
+            try:
+                (cacheversion, records) = marshal.loads(UT.readfile(self.filen))
+                if cacheversion == (self.version, font.UFOversion): self.records = records
+            except (IOError, EOFError, ValueError, TypeError) as e:
+                font.logger.log("Ignoring invalid cache file " + self.filen + ": " + str(e), "W")
+
+    def scanGlif(self, fulln, key, stamp=None):  # stamp is (mtime, size) if already known, eg from the font's dirTree
+        if stamp is None:
+            stat = os.stat(fulln)
+            stamp = (stat.st_mtime, stat.st_size)
+        cached = self.records.get(key)
+        if cached is not None and cached[0] == stamp:
+            record = UglifRecord(*cached[1])
+        else:
+            record = scanGlif(fulln, self.font.UFOversion)
+        self.current[key] = (stamp, tuple(record))
+        return record
+
+    def save(self):  # Write the cache file if anything has changed
+        if self.current == self.records: return
+        cachedir = os.path.dirname(self.filen)
+        try:
+            if not os.path.isdir(cachedir): os.makedirs(cachedir)
+            UT.writefile(self.filen, marshal.dumps(((self.version, self.font.UFOversion), self.current)))
+        except (IOError, OSError) as e:
+            self.font.logger.log("Unable to write cache file " + self.filen + ": " + str(e), "W")
+        self.records = self.current
+
+
+class UwriteManifest(object):
+    # Record of the xml files written by Ufont.write() with their mtime, size and a hash of their xml, along with a
+    # signature of the outparams used.  Files that still match are known to be normalised with those outparams, and
+    # can be compared with new output using the hash.  Held in a single file in cachedir, which is relative to the font's
+    # parent directory.
+    # A file's (mtime, size) only shows it is unchanged if a later edit would have changed its mtime, so stamps are not
+    # trusted if the filesystem has no sub-second mtimes or if the file's mtime is within mtimegranularity of the
+    # manifest's own mtime.  Those files are read instead
+    version = 2  # Increment if format changes
+    mtimegranularity = 0.1  # Allows for filesystems that take mtimes from a coarse clock
+
+    def __init__(self, ufodir, paramset, logger, read=True):
+        self.ufodir = os.path.abspath(ufodir).rstrip(os.sep)
+        self.filen = manifestFile(ufodir, paramset)
+        self.logger = logger
+        self.signature = None
+        self.files = {}  # (mtime, size, hash) keyed on path relative to the font
+        self.written = None  # mtime of the manifest file
+        if read and os.path.isfile(self.filen):
+            try:
+                (manversion, signature, files) = marshal.loads(UT.readfile(self.filen))
+                if manversion == self.version: (self.signature, self.files) = (signature, files)
+                self.written = os.stat(self.filen).st_mtime
+            except (IOError, OSError, EOFError, ValueError, TypeError) as e:
+                logger.log("Ignoring invalid write manifest " + self.filen + ": " + str(e), "W")
+
+    def hash(self, relpath, stamp=None):  # Hash of file's xml if it is unchanged since written, otherwise None
+        # stamp is the file's current (mtime, size) if already known, eg from a dirTree of the output UFO
+        if relpath not in self.files: return None
+        (mtime, size, hash) = self.files[relpath]
+        if mtime == int(mtime) or self.written is None or mtime > self.written - self.mtimegranularity: return None
+        if stamp is None:
+            try:
+                stat = os.stat(os.path.join(self.ufodir, relpath))
+            except OSError:
+                return None
+            stamp = (stat.st_mtime, stat.st_size)
+        return hash if (mtime, size) == stamp else None
+
+    def normalised(self, relpath, signature, stamp=None):  # True if file is unchanged since written with outparams matching signature
+        return signature == self.signature and self.hash(relpath, stamp) is not None
+
+    def save(self, signature, hashes):  # hashes is a dict of xml hashes keyed on relative path
+        files = {}
+        for relpath in hashes:
+            stat = os.stat(os.path.join(self.ufodir, relpath))
+            files[relpath] = (stat.st_mtime, stat.st_size, hashes[relpath])
+        (self.signature, self.files) = (signature, files)
+        mandir = os.path.dirname(self.filen)
+        try:
+            if not os.path.isdir(mandir): os.makedirs(mandir)
+            UT.writefile(self.filen, marshal.dumps((self.version, signature, files)))
+            self.written = os.stat(self.filen).st_mtime
+        except (IOError, OSError) as e:
+            self.written = None
+            self.logger.log("Unable to write manifest " + self.filen + ": " + str(e), "W")
+
+
+def manifestFile(ufodir, paramset):  # Path of the write manifest for a font, in cachedir
+    ufodir = os.path.abspath(ufodir).rstrip(os.sep)
+    return os.path.join(os.path.dirname(ufodir), paramset["cachedir"], os.path.basename(ufodir) + ".written")
+
+
+def xmlHash(xmlstr):  # Hash of serialised xml, as held in write manifests
+    return hashlib.md5(xmlstr.encode("utf-8")).hexdigest()
+
+
+def outSignature(outparams):  # Signature for a set of outparams, to tell if files were written with the same ones
+    import json
+    return hashlib.md5(json.dumps([silfont.core.__version__, outparams], sort_keys=True)).hexdigest()
+
+
+def _elemdata(element):
+    return (element.tag, element.attrib, element.text, element.tail, [_elemdata(e) for e in element])
+
+
+def _indexKeys(glyph):  # (unicode values, component bases, anchor names) for a Uglif or UglifRecord
+    if isinstance(glyph, UglifRecord):
+        return (_usvs(glyph.unicodes), tuple(glyph.components), tuple(anchor[0] for anchor in glyph.anchors))
+    contents = glyph._contents
+    outline = contents.get("outline")
+    return (_usvs([unicode.hex for unicode in contents.get("unicode", ())]),
+            tuple(component.element.get("base") for component in outline.components) if outline is not None else (),
+            tuple(anchor.element.get("name") for anchor in contents.get("anchor", ())))
+
+def _usvs(hexes):  # Unicode values as integers, ignoring any invalid hex strings
+    usvs = []
+    for hex in hexes:
+        try:
+            usvs.append(int(hex, 16))
+        except ValueError:
+            pass
+    return tuple(usvs)
+
+def _importNumpy():  # NumPy is optional, and is only imported when needed since it is slow to import
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def _numstr(value):  # Format a coordinate for an attribute value
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def fingerprint(object):
+    # Digest of the data in a glif or plist object, used to tell if it has changed since being read
+    if object.type == "glif":  # Use the sub-objects, since the glif's etree is only rebuilt when writing
+        if object._contents["outline"] is not None: object._contents["outline"].syncpoints()
+        data = [object.filen, object.name, object.format]
+        for elem in object.glifElemOrder:
+            item = object._contents[elem]
+            if item is None: continue
+            for obj in (item if elem in _glifElemMulti else [item]): data.append(_elemdata(obj.element))
+    else:
+        data = _elemdata(object.etree)
+    return hashlib.md5(marshal.dumps(data)).digest()
+
+
+def writeXMLobject(dtreeitem, params, dirn, filen, exists, fobject=False, ohash=None):
     object = dtreeitem if fobject else dtreeitem.fileObject  # Set fobject to True if a file object is passed ratehr than dtreeitem
     if object.outparams: params = object.outparams  # override default params with object-specific ones
     indentFirst = params["indentFirst"]
@@ -1031,23 +1802,22 @@ def writeXMLobject(dtreeitem, params, dirn, filen, exists, fobject=False):
     etw = ETU.ETWriter(object.etree, attributeOrder=attribOrder, indentIncr=params["indentIncr"],
                        indentFirst=indentFirst, indentML=params["indentML"], precision=params["precision"],
                        numAttribs=params["numAttribs"])
+    object.outxmlstr = ""  # Reset in case the object has been written before
     etw.serialize_xml(object.write_to_xml)
     # Now we have the output xml, need to compare with existing item's xml, if present
     changed = True
 
     if exists:  # File already on disk
-        if exists == "same":  # Output and input locations the same
+        if ohash is not None:  # Hash of existing file's xml is known from write manifest
+            oxmlstr = object.outxmlstr if xmlHash(object.outxmlstr) == ohash else None
+        elif exists == "same":  # Output and input locations the same
             oxmlstr = object.inxmlstr
         else:  # Read existing XML from disk
-            oxmlstr = ""
             try:
-                oxml = open(os.path.join(dirn, filen), "r")
+                oxmlstr = UT.readfile(os.path.join(dirn, filen)).decode("utf-8", "replace")
             except Exception as e:
                 print(e)
                 sys.exit(1)
-            for line in oxml.readlines():
-                oxmlstr += line
-            oxml.close()
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", UnicodeWarning)
             if oxmlstr == object.outxmlstr: changed = False
@@ -1064,8 +1834,20 @@ def setFileForOutput(dtree, filen, fileObject, fileType):  # Put details in dtre
     dtree[filen].setinfo(fileObject=fileObject, fileType=fileType, towrite=True)
 
 
-def writeToDisk(dtree, outdir, font, odtree=None, logindent="", changes = False):
+def openLimit(paramset, threads=False):
+    # Semaphore for UT.setopenlimit() to limit the files open at once by a pool of threads or processes, based on the
+    # maxopen parameter, or None if there is no limit
+    maxopen = int(paramset["maxopen"])
+    if not maxopen: return None
+    if threads:
+        import threading
+        return threading.BoundedSemaphore(maxopen)
+    import multiprocessing
+    return multiprocessing.BoundedSemaphore(maxopen)
+
+def writeToDisk(dtree, outdir, font, odtree=None, logindent="", changes = False, pool=None):
     if odtree is None: odtree = {}
+    pooljobs = []  # glifs to be written by the pool, if there is one
     # Make lists of items in dtree and odtree with type prepended for sorting and comparison purposes
     dtreelist = []
     for filen in dtree: dtreelist.append(dtree[filen].type + filen)
@@ -1109,15 +1891,26 @@ def writeToDisk(dtree, outdir, font, odtree=None, logindent="", changes = False)
             if dtreeitem.towrite:
                 font.logger.log(logindent + filen, "V")
                 if dtreeitem.fileType == "xml":
-                    if dtreeitem.fileObject:  # Only write if object has items
+                    relpath = os.path.relpath(os.path.join(outdir, filen), font.outdir)
+                    ostamp = odtree[filen].stamp if exists else None  # Saves stat-ing the file again for manifests
+                    if exists and dtreeitem.fileObject and font.unchanged(dtreeitem.fileObject, relpath, ostamp):
+                        dtreeitem.written = True
+                        font.normalised[os.path.join(outdir, filen)] = font.manifest.hash(relpath, ostamp)
+                    elif dtreeitem.fileObject:  # Only write if object has items
                         if dtreeitem.fileObject.type == "glif":  # Delete lib if no items in it
                             glif = dtreeitem.fileObject
                             if glif["lib"] is not None:
                                 if glif["lib"].__len__() == 0:
                                     glif.remove("lib")
                             glif.rebuildET()
-                        result = writeXMLobject(dtreeitem, font.outparams, outdir, filen, exists)
-                        if result: changes = True
+                        ohash = font.outmanifest.hash(relpath, ostamp) if exists and font.outmanifest else None
+                        if pool and dtreeitem.fileObject.type == "glif":
+                            pooljobs.append((dtreeitem, filen, exists, ohash))
+                        else:
+                            result = writeXMLobject(dtreeitem, font.outparams, outdir, filen, exists, ohash=ohash)
+                            if result: changes = True
+                            if not dtreeitem.fileObject.outparams:
+                                font.normalised[os.path.join(outdir, filen)] = xmlHash(dtreeitem.fileObject.outxmlstr)
                     else:  # Delete existing item if the current object is empty
                         if exists:
                             font.logger.log('Deleting empty item ' + filen + ' from existing output UFO', "I")
@@ -1125,6 +1918,11 @@ def writeToDisk(dtree, outdir, font, odtree=None, logindent="", changes = False)
                             changes = True
                 elif dtreeitem.fileType == "text":
                     dtreeitem.fileObject.write(dtreeitem, outdir, filen, exists)
+                elif dtreeitem.fileType == "lazy":
+                    if dtreeitem.fileObject.write(dtreeitem, outdir, filen, exists): changes = True
+                    relpath = os.path.relpath(os.path.join(outdir, filen), font.outdir)
+                    if font.inplace and font.manifest and font.manifest.normalised(relpath, font.outsignature):
+                        font.normalised[os.path.join(outdir, filen)] = font.manifest.hash(relpath)  # Copied unchanged
                     ## Need to add code for other file types
             else:
                 if filen in dtree.removedfiles:
@@ -1172,7 +1970,7 @@ def writeToDisk(dtree, outdir, font, odtree=None, logindent="", changes = False)
                 else:
                     subodtree = {}
                 subindent = logindent + "  "
-                changes = writeToDisk(dtreeitem.dirtree, subdir, font, subodtree, subindent, changes)
+                changes = writeToDisk(dtreeitem.dirtree, subdir, font, subodtree, subindent, changes, pool)
                 if os.listdir(subdir) == []:
                     os.rmdir(subdir)  # Delete directory if empty
                     changes = True
@@ -1189,8 +1987,38 @@ def writeToDisk(dtree, outdir, font, odtree=None, logindent="", changes = False)
             changes = True
         if ofilen not in dtree.removedfiles: font.logger.log(logmess, "W")  # No need to log warning for removed files
         okey = odtreelist.pop(0) if odtreelist != [] else None
+
+    if pooljobs:  # Serialise, compare and write this directory's glifs using the pool
+        jobs = []
+        for (dtreeitem, filen, exists, ohash) in pooljobs:
+            glif = dtreeitem.fileObject
+            params = glif.outparams if glif.outparams else font.outparams
+            inxmlstr = glif.inxmlstr if exists == "same" else None
+            jobs.append((ETU.etreetotuple(glif.etree), params, outdir, filen, exists, inxmlstr, ohash))
+        results = pool.map(_writeGlifJob, jobs)
+        for (dtreeitem, filen, exists, ohash), (changed, outxmlstr, error) in zip(pooljobs, results):
+            if error: font.logger.log("Failed to write " + filen + ": " + error, "S")
+            dtreeitem.fileObject.outxmlstr = outxmlstr
+            dtreeitem.written = True
+            if changed: changes = True
+            if not dtreeitem.fileObject.outparams: font.normalised[os.path.join(outdir, filen)] = xmlHash(outxmlstr)
     return changes
 
+def _writeGlifJob(job):
+    # Run by the worker pool in writeToDisk.  Uses a temporary xmlitem built from the glif's etree so that
+    # writeXMLobject does exactly the same serialisation and comparison as when writing serially
+    (etreetuple, params, dirn, filen, exists, inxmlstr, ohash) = job
+    try:
+        item = ETU.xmlitem()
+        item.type = "glif"
+        item.outparams = None
+        item.etree = ETU.tupletoetree(etreetuple)
+        item.inxmlstr = inxmlstr
+        changed = writeXMLobject(item, params, dirn, filen, exists, fobject=True, ohash=ohash)
+        return (changed, item.outxmlstr, None)
+    except BaseException as e:  # Includes SystemExit, which would otherwise leave the pool waiting for the job
+        return (None, None, str(e))
+
 def normETdata(element, params, type):
     # Recursively normalise the data an an ElementTree element
     for subelem in element:
@@ -1226,7 +2054,8 @@ def getattrib(element, attrib): return element.attrib[attrib] if attrib in eleme
 
 
 def makeFileName(name, namelist=None):
-    if namelist is None: namelist = []
+    # namelist is a container of lower-case names (without .glif) already used; a set keeps the checks fast
+    if namelist is None: namelist = ()
     # Replace illegal characters and add _ after UC letters
     newname = ""
     for x in name:
@@ -1252,3 +2081,7 @@ def makeFileName(name, namelist=None):
             i += 1
         name = newname
     return name
+
+def _glifKey(glifn):  # Key for a glif file name in Ulayer._glifnames
+    glifn = glifn.lower()
+    return glifn[:-5] if glifn.endswith(".glif") else glifn
@@ -5,22 +5,36 @@ __copyright__ = 'Copyright (c) 2014 SIL International (http://www.sil.org)'
 __license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
 __author__ = 'David Raymond'
 
-import os, subprocess, difflib, sys
+import os, sys, shutil
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir  # Backport for python 2
+    except ImportError:
+        scandir = None
 
 class dirTree(dict) :
     """ An object to hold list of all files and directories in a directory
         with option to read sub-directory contents into dirTree objects.
-        Iterates through readSub levels of subfolders
+        Sub-directories are read, to readSub levels, when their dirtree is first accessed
         Flags to keep track of changes to files etc"""
     def __init__(self,dirn,readSub = 9999) :
         self.removedfiles = {} # List of files that have been renamed or deleted since reading from disk
-        for name in os.listdir(dirn) :
+        self.dirn = dirn
+        if scandir : # Single pass using the file type from the directory listing
+            entries = [(entry.name, entry.is_dir(), entry) for entry in scandir(dirn)]
+        else :
+            entries = [(name, os.path.isdir(os.path.join(dirn, name)), None) for name in os.listdir(dirn)]
+        for (name, isdir, entry) in entries :
             if name[-1:] == "~" : continue
             item=dirTreeItem()
-            if os.path.isdir(os.path.join(dirn, name)) :
+            item.path = os.path.join(dirn, name)
+            item._entry = entry
+            if isdir :
                 item.type = "d"
-                if readSub :
-                    item.dirtree = dirTree(os.path.join(dirn,name),readSub-1)
+                item._readSub = readSub - 1 if readSub else None
             self[name] = item
 
     def subTree(self,path) : # Returns dirTree object for a subtree based on subfolder name(s)
@@ -48,7 +62,8 @@ class dirTreeItem(object) :
 
     def __init__(self, type = "f", dirtree = None, read = False, added = False, changed = False, towrite = False, written = False, fileObject = None, fileType = None, flags = {}) :
         self.type = type                # "d" or "f"
-        self.dirtree = dirtree          # dirtree for a sub-directory
+        self.dirtree = dirtree          # dirtree for a sub-directory, read from disk when first accessed
+        self.path = None                # Path of the file or directory on disk, if read from disk
         # Remaining properties are for calling scripts to use as they choose to track actions etc
         self.read = read                # Item has been read by the script
         self.added = added              # Item has been added to dirtree, so does not exist on disk
@@ -58,6 +73,31 @@ class dirTreeItem(object) :
         self.fileObject = fileObject    # An object representing the file
         self.fileType = fileType        # The type of the file object
         self.flags = {}                 # Any other flags a script might need
+        self._entry = None              # scandir entry for the item, if available
+        self._readSub = None            # Levels of sub-directories still to read, if dirtree is not yet read
+        self._stamp = None
+
+    @property
+    def dirtree(self) :
+        if self._readSub is not None :
+            self._dirtree = dirTree(self.path, self._readSub)
+            self._readSub = None
+        return self._dirtree
+
+    @dirtree.setter
+    def dirtree(self, value) :
+        self._dirtree = value
+        self._readSub = None
+
+    @property
+    def stamp(self) : # (mtime, size) of the file on disk when first requested, or None if not read from disk
+        if self._stamp is None and self.path is not None :
+            try :
+                stat = self._entry.stat() if self._entry else os.stat(self.path)
+            except OSError :
+                return None
+            self._stamp = (stat.st_mtime, stat.st_size)
+        return self._stamp
 
     def setinfo(self, read = None, added = None, changed = None, towrite = None, written = None, fileObject = None, fileType = None, flags = None) :
         pass
@@ -70,6 +110,41 @@ class dirTreeItem(object) :
         if fileType : self.fileType = fileType
         if flags : self.flags = flags
 
+_openlimit = None  # Semaphore limiting the number of files open at once in readfile() and writefile()
+
+def setopenlimit(semaphore) : # Set (or with None, remove) the limit on files open at once, eg for worker pools
+    global _openlimit
+    _openlimit = semaphore
+
+def readfile(fulln) : # Return the contents of a file as bytes, using a single read
+    limit = _openlimit
+    if limit : limit.acquire()
+    try :
+        with open(fulln, "rb") as infile :
+            return infile.read()
+    finally :
+        if limit : limit.release()
+
+def writefile(fulln, data, encoding = "utf-8") :
+    # Write data (bytes, or text to be encoded) to fulln atomically, by writing to a temporary file in the same
+    # directory then renaming it over fulln.  The temporary name ends in ~ so is ignored by dirTree
+    if not isinstance(data, bytes) : data = data.encode(encoding)
+    tempn = fulln + ".tmp~"
+    limit = _openlimit
+    if limit : limit.acquire()
+    try :
+        with open(tempn, "wb") as outfile :
+            outfile.write(data)
+        if os.path.exists(fulln) :
+            shutil.copymode(fulln, tempn)
+            if os.name == "nt" : os.remove(fulln)  # Needed for os.rename() on Windows
+        os.rename(tempn, fulln)
+    except :
+        if os.path.exists(tempn) : os.remove(tempn)
+        raise
+    finally :
+        if limit : limit.release()
+
 class ufo_diff(object): # For diffing 2 ufos as part of testing
     # returncodes:
     #   0 - ufos are the same
@@ -79,6 +154,7 @@ class ufo_diff(object): # For diffing 2 ufos as part of testing
     # errors - text of the errors
 
     def __init__(self, ufo1, ufo2, ignoreOHCtime=True):
+        import subprocess
 
         diffcommand = ["diff", "-r", "-c1", ufo1, ufo2]
 
@@ -116,6 +192,7 @@ class text_diff(object): # For diffing 2 text files with option to ignore timest
     # See ufo_diff for class attribute details
 
     def __init__(self, log1, log2, ignore=0): # ignore - characters to ignore from left; typically 20 for timestamps
+        import difflib
         errors = []
         try:
             l1 = [x[ignore:-1] for x in open(log1, "r").readlines()]
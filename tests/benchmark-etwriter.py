@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+from __future__ import print_function
+'''Benchmark ETWriter.serialize_xml() with plists of increasing size to check that time scales linearly with
+the number of elements.  Builds a lib.plist-style file with a public.glyphOrder array and a kerning-style dict.
+Run from the tests directory:
+    python benchmark-etwriter.py [max size]'''
+__url__ = 'http://github.com/silnrsi/pysilfont'
+__copyright__ = 'Copyright (c) 2018 SIL International (http://www.sil.org)'
+__license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
+
+import sys, os, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from xml.etree import cElementTree as ET
+import silfont.etutil as ETU
+
+def makeplist(size):
+    plist = ET.Element("plist", {"version": "1.0"})
+    dict = ET.SubElement(plist, "dict")
+    ET.SubElement(dict, "key").text = "public.glyphOrder"
+    array = ET.SubElement(dict, "array")
+    for i in range(size): ET.SubElement(array, "string").text = "glyph%05d" % i
+    ET.SubElement(dict, "key").text = "kerning"
+    kdict = ET.SubElement(dict, "dict")
+    for i in range(size):
+        ET.SubElement(kdict, "key").text = "glyph%05d" % i
+        ET.SubElement(kdict, "integer").text = str(-i % 100)
+    return plist
+
+def serialize(plist):
+    item = ETU.xmlitem()
+    etw = ETU.ETWriter(plist, attributeOrder=ETU.makeAttribOrder(["version"]), indentFirst="")
+    etw.serialize_xml(item.write_to_xml)
+    return item.outxmlstr
+
+maxsize = int(sys.argv[1]) if len(sys.argv) > 1 else 64000
+size = 1000
+print("{:>8} {:>10} {:>12}".format("size", "elements", "usec/elem"))
+while size <= maxsize:
+    plist = makeplist(size)
+    elements = len(list(plist.iter()))
+    secs = min(timeit.repeat(lambda: serialize(plist), number=1, repeat=3))
+    print("{:>8} {:>10} {:>12.2f}".format(size, elements, secs * 1000000 / elements))
+    size *= 2
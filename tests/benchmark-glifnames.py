@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+from __future__ import print_function
+'''Benchmark and check glif file name allocation on a large synthetic layer.
+
+Generates a UFO3 font whose glifs all have non-standard file names, with glyph names chosen so that many of the
+standard file names clash case-insensitively (eg G00001 and g_00001 both give g_00001).  It is opened lazily then
+renameGlifs(), addGlyph(), glyph renames and delGlyphs() are timed, checking after each that every glif file name in
+the layer is unique ignoring case, matches contents.plist and is the one makeFileName() gives for the glyph name
+(possibly with a numeric suffix).  Renaming a glyph to a name with the same standard file name (eg a_b to a|b) must
+keep its file name.  The exit status is 1 if any check fails.
+
+Run from the tests directory, eg:
+    python benchmark-glifnames.py -g 50000'''
+__url__ = 'http://github.com/silnrsi/pysilfont'
+__copyright__ = 'Copyright (c) 2018 SIL International (http://www.sil.org)'
+__license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
+
+import sys, os, time, shutil, tempfile, argparse
+libdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib")
+sys.path.insert(0, libdir)
+bm = __import__("benchmark-ufo")
+
+def makefont(path, glyphs):
+    os.makedirs(os.path.join(path, "glyphs"))
+    glyphns = []
+    for i in range(glyphs // 2):
+        glyphns += ["G%05d" % i, "g_%05d" % i]
+    contents = []
+    for i, glyphn in enumerate(glyphns):
+        glifn = "x%06d.glif" % i
+        bm.writefile(os.path.join(path, "glyphs", glifn), '<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<glyph name="%s" format="2">\n<advance width="500"/>\n<outline/>\n</glyph>\n' % glyphn)
+        contents.append((glyphn, "<string>%s</string>" % glifn))
+    bm.writefile(os.path.join(path, "glyphs", "contents.plist"), bm.plisthead + bm.plistdict(contents) + "</plist>\n")
+    bm.writefile(os.path.join(path, "metainfo.plist"), bm.plisthead + bm.plistdict([
+        ("creator", "<string>benchmark</string>"), ("formatVersion", "<integer>3</integer>")]) + "</plist>\n")
+    bm.writefile(os.path.join(path, "fontinfo.plist"), bm.plisthead + bm.plistdict([
+        ("familyName", "<string>Benchmark</string>"), ("unitsPerEm", "<integer>1000</integer>")]) + "</plist>\n")
+    bm.writefile(os.path.join(path, "layercontents.plist"), bm.plisthead +
+                 "<array>\n<array><string>public.default</string><string>glyphs</string></array>\n</array>\n</plist>\n")
+
+def check(layer, UFO):  # Returns a list of problems with the layer's glif file names
+    problems = []
+    keys = {}
+    for glyphn in layer.contents:
+        glifn = layer.contents[glyphn][1].text
+        if glifn != layer._contents[glyphn].filen: problems.append(glyphn + ": filen does not match contents.plist")
+        stem = UFO.makeFileName(glyphn)
+        if not glifn.endswith(".glif") or not (glifn[:-5] == stem or glifn[:-5 - 15] == stem):
+            problems.append(glyphn + ": unexpected file name " + glifn)
+        key = glifn.lower()
+        if key in keys: problems.append(glyphn + ": file name " + glifn + " also used for " + keys[key])
+        keys[key] = glyphn
+    if layer._glifnames != set(UFO._glifKey(glifn) for glifn in keys):
+        problems.append("Layer's glif name registry does not match contents.plist")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check glif file name allocation")
+    parser.add_argument("-g", "--glyphs", type=int, default=50000, help="Number of glyphs (default 50000)")
+    parser.add_argument("-d", "--dir", help="Directory for the font (default is a temporary directory, deleted at end)")
+    args = parser.parse_args()
+
+    import silfont.ufo as UFO
+    from silfont.core import loggerobj
+    basedir = args.dir if args.dir else tempfile.mkdtemp()
+    fontn = os.path.join(basedir, "glifnames.ufo")
+    if os.path.exists(fontn): shutil.rmtree(fontn)
+    makefont(fontn, args.glyphs)
+    font = UFO.Ufont(fontn, logger=loggerobj(scrlevel="S"), lazy=True)
+    layer = font.deflayer
+    count = args.glyphs // 10
+    failed = False
+
+    def step(name, func):  # func can return a list of problems of its own
+        t = time.time()
+        problems = func() or []
+        wall = time.time() - t
+        problems += check(layer, UFO)
+        print("{:<16}{:>10.3f}s  {}".format(name, wall, "ok" if not problems else "%d problems" % len(problems)))
+        for problem in problems[0:10]: print("    " + problem)
+        return bool(problems)
+
+    def add(suffix):  # Pairs of new glyphs whose standard file names clash case-insensitively
+        for i in range(0, count, 2):
+            layer.addGlyph(UFO.Uglif(layer, name="G%05d%s" % (i, suffix.upper())))
+            layer.addGlyph(UFO.Uglif(layer, name="g_%05d%s_" % (i, suffix)))
+
+    def rename():
+        for i in range(0, count, 2): layer["G%05d" % i].name = "g_%05d_new" % i
+
+    def renamesame():  # New names with the same standard file name should keep the glyph's file name
+        problems = []
+        for i in range(0, count, 2):
+            glyph = layer["g_%05d_new" % i]
+            filen = glyph.filen
+            glyph.name = "g_%05d|new" % i
+            if glyph.filen != filen: problems.append(glyph.name + ": file name changed from " + filen + " to " + glyph.filen)
+        return problems
+
+    def delete():
+        layer.delGlyphs(["g_%05d" % i for i in range(1, count, 2)])
+
+    failed |= step("renameGlifs", layer.renameGlifs)
+    failed |= step("addGlyph", lambda: add("x"))
+    failed |= step("rename", rename)
+    failed |= step("rename same", renamesame)
+    failed |= step("delGlyphs", delete)
+    failed |= step("addGlyph", lambda: add("y"))
+    failed |= step("renameGlifs", layer.renameGlifs)
+
+    if not args.dir: shutil.rmtree(basedir)
+    if failed: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
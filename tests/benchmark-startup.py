@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+'''Benchmark the start-up time of pysilfont commands.
+
+Runs each command that setup.py installs (ie each script in lib/silfont/scripts) with -h in a new process and reports
+the fastest wall time over a number of runs, along with the time for python to start and do nothing.  Commands that
+fail, eg because a dependency is not installed, are reported as such.
+
+Results can be saved with --json and compared with an earlier run with --compare, in which case commands that are
+slower by more than --tolerance percent are reported and the exit status is 1.
+
+Run from the tests directory, eg:
+    python benchmark-startup.py --json before.json
+    python benchmark-startup.py --compare before.json'''
+from __future__ import print_function
+__url__ = 'http://github.com/silnrsi/pysilfont'
+__copyright__ = 'Copyright (c) 2018 SIL International (http://www.sil.org)'
+__license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
+
+import sys, os, time, json, subprocess, argparse, collections
+libdir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+def commands():  # Same list as the console_scripts entry points in setup.py
+    names = []
+    for filen in sorted(os.listdir(os.path.join(libdir, "silfont", "scripts"))):
+        (base, ext) = os.path.splitext(filen)
+        if ext == ".py" and base != "__init__": names.append(base)
+    return names
+
+def timerun(code, repeat):  # Returns (best wall time in ms, True if ran successfully)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = libdir + os.pathsep + env.get("PYTHONPATH", "")
+    best = None
+    for i in range(repeat):
+        t = time.time()
+        proc = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        proc.communicate()
+        wall = (time.time() - t) * 1000
+        if proc.returncode: return (wall, False)
+        if best is None or wall < best: best = wall
+    return (best, True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the start-up time of pysilfont commands")
+    parser.add_argument("-c", "--commands", help="Comma-separated list of commands to time (default all)")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Runs of each command; the fastest is reported")
+    parser.add_argument("--json", help="Save results to a json file")
+    parser.add_argument("--compare", help="Compare with results in a json file from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=20, help="Percent slower for a regression (default 20)")
+    args = parser.parse_args()
+
+    names = args.commands.split(",") if args.commands else commands()
+    results = collections.OrderedDict()
+    print("{:<26}{:>10}".format("command", "ms"))
+    (wall, ok) = timerun("pass", args.repeat)
+    results["python"] = wall
+    print("{:<26}{:>10.1f}".format("(python)", wall))
+    for name in names:
+        code = "import sys; sys.argv = ['%s', '-h']; from silfont.scripts.%s import cmd; cmd()" % (name, name)
+        (wall, ok) = timerun(code, args.repeat)
+        results[name] = wall if ok else None
+        print("{:<26}".format(name) + ("{:>10.1f}".format(wall) if ok else "{:>10}".format("failed")))
+
+    if args.json:
+        with open(args.json, "w") as f: json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f: old = json.load(f)["results"]
+        regressions = 0
+        print("\nComparison with " + args.compare)
+        for name in results:
+            new, prev = results[name], old.get(name)
+            if new is None or prev is None: continue
+            change = (new - prev) * 100.0 / prev
+            flag = ""
+            if change > args.tolerance:
+                flag = "  ** regression"
+                regressions += 1
+            print("{:<26}{:>10.1f}{:>10.1f}{:>+9.1f}%{}".format(name, prev, new, change, flag))
+        if regressions: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
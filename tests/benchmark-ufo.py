@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+from __future__ import print_function
+'''Benchmark the UFO read/normalize/write cycle using synthetic UFO2 and UFO3 fonts.
+
+Generates fonts of the requested size, then times opening them with Ufont, writing to a new directory, writing in
+place (both for a font not yet normalized and for one that is already normalized) and running some representative
+scripts.  Each step is run in a separate process on a fresh copy of the font, and wall time, peak RSS and a per-phase
+breakdown (import, read, write and other processing) are reported.
+
+With --cache, steps are run with the cache parameter set to on, so the rewrite-inplace step uses the write manifest
+written by the untimed write-inplace before it.
+
+Results can be saved with --json and compared with an earlier run with --compare, in which case steps that are
+slower by more than --tolerance percent are reported and the exit status is 1.
+
+Run from the tests directory, eg:
+    python benchmark-ufo.py -g 5000 --json before.json
+    python benchmark-ufo.py -g 5000 --compare before.json'''
+__url__ = 'http://github.com/silnrsi/pysilfont'
+__copyright__ = 'Copyright (c) 2018 SIL International (http://www.sil.org)'
+__license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
+
+import sys, os, time, json, shutil, random, subprocess, tempfile, argparse, collections
+libdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib")
+sys.path.insert(0, libdir)
+
+steps = ["open", "write-new", "write-inplace", "rewrite-inplace", "psfnormalize", "psfsubset", "psfrenameglyphs",
+         "psfbuildcomp"]
+plisthead = ('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE plist PUBLIC "-//Apple Computer//DTD PLIST 1.0//EN" '
+             '"http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n<plist version="1.0">\n')
+
+def writefile(path, text):
+    with open(path, "w") as f: f.write(text)
+
+def plistdict(items):  # items is a list of (key, xml for value)
+    return "<dict>\n" + "".join("<key>%s</key>%s\n" % item for item in items) + "</dict>\n"
+
+def makefont(path, version, args):
+    # Create a synthetic UFO.  Base glyphs have anchors; marks have matching _ anchors so composites can be built
+    rand = random.Random(1)
+    os.makedirs(os.path.join(path, "glyphs"))
+    ancnames = (["top", "bottom"] + ["anc%d" % i for i in range(args.anchors)])[0:args.anchors]
+    bases = ["g%05d" % i for i in range(args.glyphs)]
+    marks = ["mark%03d" % i for i in range(args.marks)]
+    contents = []
+    for glyphn in bases + marks:
+        ismark = glyphn.startswith("mark")
+        glif = '<?xml version="1.0" encoding="UTF-8"?>\n<glyph name="%s" format="%d">\n' % (glyphn, version - 1)
+        glif += '<advance width="%d"/>\n' % (0 if ismark else rand.randint(300, 1200))
+        if not ismark: glif += '<unicode hex="%04X"/>\n' % (0xE000 + len(contents))
+        anchors = [(name, rand.randint(0, 600), rand.randint(-200, 800)) for name in ancnames]
+        if ismark: anchors += [("_" + name, x, y) for (name, x, y) in anchors]
+        if version == 3: glif += "".join('<anchor name="%s" x="%d" y="%d"/>\n' % a for a in anchors)
+        glif += "<outline>\n"
+        if version == 2:
+            glif += "".join('<contour><point name="%s" x="%d" y="%d" type="move"/></contour>\n' % a for a in anchors)
+        for c in range(args.contours):
+            glif += "<contour>\n"
+            for p in range(args.points):
+                ptype = ' type="curve" smooth="yes"' if p % 3 == 2 else ""
+                glif += '<point x="%.1f" y="%.1f"%s/>\n' % (rand.uniform(0, 1000), rand.uniform(-200, 800), ptype)
+            glif += "</contour>\n"
+        glif += "</outline>\n"
+        if args.libkeys:
+            items = [("org.sil.benchmark.key%d" % k, "<string>value %d</string>" % k) for k in range(args.libkeys)]
+            glif += "<lib>\n" + plistdict(items) + "</lib>\n"
+        glif += "</glyph>\n"
+        writefile(os.path.join(path, "glyphs", glyphn + ".glif"), glif)
+        contents.append((glyphn, "<string>%s.glif</string>" % glyphn))
+    writefile(os.path.join(path, "glyphs", "contents.plist"), plisthead + plistdict(contents) + "</plist>\n")
+
+    writefile(os.path.join(path, "metainfo.plist"), plisthead + plistdict([("creator", "<string>benchmark</string>"),
+        ("formatVersion", "<integer>%d</integer>" % version)]) + "</plist>\n")
+    fontinfo = [("familyName", "<string>Benchmark</string>"), ("styleName", "<string>Regular</string>"),
+        ("unitsPerEm", "<integer>1000</integer>"), ("ascender", "<integer>800</integer>"),
+        ("descender", "<integer>-200</integer>"), ("xHeight", "<integer>500</integer>"),
+        ("capHeight", "<integer>700</integer>"), ("versionMajor", "<integer>1</integer>"),
+        ("versionMinor", "<integer>0</integer>"), ("copyright", "<string>Copyright (c) SIL International</string>"),
+        ("openTypeNameManufacturer", "<string>SIL International</string>"),
+        ("postscriptFontName", "<string>Benchmark-Regular</string>")]
+    writefile(os.path.join(path, "fontinfo.plist"), plisthead + plistdict(fontinfo) + "</plist>\n")
+    glyphorder = "<array>\n" + "".join("<string>%s</string>\n" % g for g in bases + marks) + "</array>"
+    writefile(os.path.join(path, "lib.plist"), plisthead + plistdict([("public.glyphOrder", glyphorder)]) + "</plist>\n")
+
+    # Kerning between a few classes plus glyph pairs
+    prefix1, prefix2 = ("public.kern1.", "public.kern2.") if version == 3 else ("@MMK_L_", "@MMK_R_")
+    groups = []
+    for i in range(10):
+        members = "".join("<string>%s</string>" % g for g in bases[i::max(args.glyphs // 50, 10)])
+        groups += [(prefix1 + "c%d" % i, "<array>%s</array>" % members), (prefix2 + "c%d" % i, "<array>%s</array>" % members)]
+    writefile(os.path.join(path, "groups.plist"), plisthead + plistdict(groups) + "</plist>\n")
+    kerning = collections.defaultdict(list)
+    for i in range(args.kerning):
+        kerning[rand.choice(bases)].append((rand.choice(bases), "<integer>%d</integer>" % rand.randint(-100, 100)))
+    kerning[prefix1 + "c0"].append((prefix2 + "c1", "<integer>-50</integer>"))
+    writefile(os.path.join(path, "kerning.plist"), plisthead +
+        plistdict([(first, plistdict(sorted(dict(kerning[first]).items()))) for first in sorted(kerning)]) + "</plist>\n")
+    writefile(os.path.join(path, "features.fea"), "languagesystem DFLT dflt;\nfeature liga {\n  sub g00000 g00001 by g00002;\n} liga;\n")
+    if version == 3:
+        writefile(os.path.join(path, "layercontents.plist"), plisthead +
+            "<array>\n<array><string>public.default</string><string>glyphs</string></array>\n</array>\n</plist>\n")
+
+    # Input files for scripts
+    datadir = os.path.dirname(path)
+    writefile(os.path.join(datadir, "subset.csv"), "glyph_name\n" + "".join(g + "\n" for g in bases[0::2] + marks))
+    writefile(os.path.join(datadir, "rename.csv"), "".join("%s,r%s\n" % (g, g) for g in bases[0::10]))
+    comps = ""
+    for i in range(0, args.glyphs, 10):
+        comps += "c%05d = %s + %s@%s\n" % (i, bases[i], marks[i % len(marks)], ancnames[0]) if marks and ancnames else ""
+    writefile(os.path.join(datadir, "comps.txt"), comps)
+
+def scriptargs(step, font, datadir, cache):
+    std = ["-p", "scrlevel=e", "-p", "backup=false", "-p", "cache=" + cache, "-l", os.path.join(datadir, step + ".log")]
+    if step == "psfnormalize": return [font] + std
+    if step == "psfsubset": return [font, os.path.join(datadir, "subset.ufo"), "-i", os.path.join(datadir, "subset.csv")] + std
+    if step == "psfrenameglyphs": return [font, "-i", os.path.join(datadir, "rename.csv")] + std
+    if step == "psfbuildcomp": return [font, "-i", os.path.join(datadir, "comps.txt"), "-f"] + std
+
+def peakrss():  # Peak RSS of this process in MB
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+def runstep(step, font, datadir, cache):
+    # Run in a child process: do the step and print a json dict of results
+    start = time.time()
+    import silfont.ufo as UFO
+    from silfont.core import parameters
+    phases = collections.OrderedDict([("import", time.time() - start), ("read", 0.0), ("write", 0.0)])
+
+    def timed(method, phase):
+        def wrapper(*args, **kwargs):
+            t = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                phases[phase] += time.time() - t
+        return wrapper
+    UFO.Ufont.__init__ = timed(UFO.Ufont.__init__, "read")
+    UFO.Ufont.write = timed(UFO.Ufont.write, "write")
+
+    t = time.time()
+    params = parameters()
+    params.addset("command line", "command line", inputdict={"cache": cache})
+    if step == "open":
+        UFO.Ufont(font, params=params)
+    elif step == "write-new":
+        UFO.Ufont(font, params=params).write(os.path.join(datadir, "new.ufo"))
+    elif step in ("write-inplace", "rewrite-inplace"):
+        UFO.Ufont(font, params=params).write(font)
+    else:
+        script = __import__("silfont.scripts." + step, fromlist=["cmd"])
+        sys.argv = [step] + scriptargs(step, font, datadir, cache)
+        script.cmd()
+    phases["other"] = time.time() - t - phases["read"] - phases["write"]
+    print(json.dumps({"phases": phases, "rss": peakrss()}))
+
+def child(step, font, datadir, cache):  # Run step in a child process, returning (wall time, results dict)
+    t = time.time()
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", step, font, datadir, cache],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    out, err = proc.communicate()
+    wall = time.time() - t
+    if proc.returncode:
+        print(err, file=sys.stderr)
+        sys.exit("Step " + step + " failed for " + font)
+    return wall, json.loads(out.strip().splitlines()[-1], object_pairs_hook=collections.OrderedDict)
+
+def fmt(value, width, prec=2):
+    return ("{:>%d.%df}" % (width, prec)).format(value) if value is not None else " " * (width - 1) + "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the UFO read/normalize/write cycle")
+    parser.add_argument("-g", "--glyphs", type=int, default=2000, help="Number of base glyphs (default 2000)")
+    parser.add_argument("-c", "--contours", type=int, default=3, help="Contours per glyph (default 3)")
+    parser.add_argument("-n", "--points", type=int, default=12, help="Points per contour (default 12)")
+    parser.add_argument("-a", "--anchors", type=int, default=2, help="Anchors per glyph (default 2)")
+    parser.add_argument("-m", "--marks", type=int, default=20, help="Number of mark glyphs (default 20)")
+    parser.add_argument("-k", "--libkeys", type=int, default=2, help="Glif lib keys per glyph (default 2)")
+    parser.add_argument("-p", "--kerning", type=int, default=2000, help="Number of kerning pairs (default 2000)")
+    parser.add_argument("-v", "--versions", default="2,3", help="UFO versions to test (default 2,3)")
+    parser.add_argument("-s", "--steps", default=",".join(steps), help="Steps to run (default all)")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Runs of each step; the fastest is reported")
+    parser.add_argument("-d", "--dir", help="Directory for fonts (default is a temporary directory, deleted at end)")
+    parser.add_argument("--cache", action="store_true", help="Run steps with the cache parameter set to on")
+    parser.add_argument("--json", help="Save results to a json file")
+    parser.add_argument("--compare", help="Compare with results in a json file from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=10, help="Percent slower for a regression (default 10)")
+    args = parser.parse_args()
+
+    runsteps = args.steps.split(",")
+    for step in runsteps:
+        if step not in steps: parser.error("Invalid step " + step + "; must be one of " + ", ".join(steps))
+    workdir = args.dir if args.dir else tempfile.mkdtemp(prefix="benchmark-ufo")
+    results = collections.OrderedDict()
+    print("{:<18}{:>4}{:>9}{:>9}{:>9}{:>9}{:>9}{:>10}".format("step", "UFO", "wall", "import", "read", "write", "other", "RSS MB"))
+    try:
+        for version in [int(v) for v in args.versions.split(",")]:
+            srcdir = os.path.join(workdir, "ufo%d" % version)
+            if os.path.exists(srcdir): shutil.rmtree(srcdir)
+            os.makedirs(srcdir)
+            source = os.path.join(srcdir, "source.ufo")
+            makefont(source, version, args)
+            for step in runsteps:
+                best = None
+                for i in range(args.repeat):
+                    datadir = os.path.join(workdir, "ufo%d" % version, step)
+                    if os.path.exists(datadir): shutil.rmtree(datadir)
+                    os.makedirs(datadir)
+                    for filen in ("subset.csv", "rename.csv", "comps.txt"):
+                        shutil.copy(os.path.join(srcdir, filen), datadir)
+                    font = os.path.join(datadir, "test.ufo")
+                    shutil.copytree(source, font)
+                    cache = "on" if args.cache else "off"
+                    if step == "rewrite-inplace": child("write-inplace", font, datadir, cache)  # Normalize first, untimed
+                    wall, result = child(step, font, datadir, cache)
+                    if best is None or wall < best[0]: best = (wall, result)
+                (wall, result) = best
+                phases = result["phases"]
+                key = "%s UFO%d" % (step, version)
+                results[key] = {"wall": wall, "rss": result["rss"], "phases": phases}
+                print("{:<18}{:>4}".format(step, version) + fmt(wall, 9) + "".join(fmt(phases[p], 9) for p in phases) +
+                      fmt(result["rss"], 10, 1))
+    finally:
+        if not args.dir: shutil.rmtree(workdir)
+
+    if args.json:
+        with open(args.json, "w") as f: json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f: old = json.load(f)["results"]
+        regressions = 0
+        print("\nComparison with " + args.compare)
+        for key in results:
+            if key not in old: continue
+            for measure in ("wall", "rss"):
+                new, prev = results[key][measure], old[key][measure]
+                if new is None or prev is None or prev == 0: continue
+                change = (new - prev) * 100.0 / prev
+                flag = ""
+                if change > args.tolerance:
+                    flag = "  ** regression"
+                    regressions += 1
+                print("{:<24}{:<6}{:>10.2f}{:>10.2f}{:>+9.1f}%{}".format(key, measure, prev, new, change, flag))
+        if regressions: sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == "--child":
+        runstep(*sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+from __future__ import print_function
+'''Check that parsing UFO xml with lxml gives exactly the same results as with cElementTree.
+
+For every glif and plist in the UFOs given (or in synthetic UFO2 and UFO3 fonts if none are given), the file is parsed
+with each backend used by silfont.etutil.parsereadonly() and the following are checked:
+- the trees are the same (tags, attributes, text and tails of every element)
+- normalised output from writeXMLobject(), using the font's parameters, is byte-identical for the cElementTree tree
+  and for a copy of the lxml tree
+- for glifs, scanGlif() gives the same record
+Differences are reported and the exit status is 1.  Parse times for each backend are also reported.
+
+Needs lxml to be installed.  Run from the tests directory, eg:
+    python test-xmlbackend.py font-Regular.ufo font-Bold.ufo'''
+__url__ = 'http://github.com/silnrsi/pysilfont'
+__copyright__ = 'Copyright (c) 2018 SIL International (http://www.sil.org)'
+__license__ = 'Released under the MIT License (http://opensource.org/licenses/MIT)'
+
+import sys, os, time, shutil, tempfile, argparse
+libdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib")
+sys.path.insert(0, libdir)
+bm = __import__("benchmark-ufo")
+
+# Extra glif for synthetic fonts with things the backends might treat differently
+oddglif = u'''<?xml version="1.0" encoding="UTF-8"?>
+<!-- Comment before the glyph -->
+<?pysilfont test?>
+<glyph name="odd" format="2">
+  <advance width="500"/>
+  <!-- Comment in the glyph -->
+  <note>Caf\u00e9 &amp; \u0915\u093f &#x263A; &lt;tag&gt;</note>
+  <anchor name="top" x="250" y="700.50"/>
+  <outline>
+    <contour>
+      <!-- Comment in a contour -->
+      <point x="0" y="0" type="line"/>
+      <point x="100.0" y="0" type="line"/>
+    </contour>
+  </outline>
+  <lib>
+    <dict>
+      <key>public.postscriptname</key>
+      <string>uni263A</string>
+    </dict>
+  </lib>
+</glyph>
+'''
+
+def makecorpus(basedir):
+    fonts = []
+    args = argparse.Namespace(glyphs=200, contours=2, points=6, anchors=2, marks=5, libkeys=2, kerning=200)
+    for version in (2, 3):
+        fontn = os.path.join(basedir, "v%d" % version, "font.ufo")
+        bm.makefont(fontn, version, args)
+        with open(os.path.join(fontn, "glyphs", "odd.glif"), "wb") as f: f.write(oddglif.encode("utf-8"))
+        fonts.append(fontn)
+    return fonts
+
+def main():
+    parser = argparse.ArgumentParser(description="Check lxml and cElementTree give the same results for UFO xml")
+    parser.add_argument("fonts", nargs="*", help="UFOs to check (default synthetic UFO2 and UFO3 fonts)")
+    args = parser.parse_args()
+
+    import silfont.ufo as UFO
+    import silfont.util as UT
+    import silfont.etutil as ETU
+    from silfont.core import loggerobj
+    if not ETU.setreadonlyparser("lxml"): sys.exit("lxml is not installed")
+
+    tempdir = tempfile.mkdtemp()
+    fonts = args.fonts if args.fonts else makecorpus(tempdir)
+    outdir = os.path.join(tempdir, "out")
+    os.mkdir(outdir)
+    times = {"etree": 0.0, "lxml": 0.0}
+    (count, failures) = (0, 0)
+
+    def parse(backend, data):
+        ETU.setreadonlyparser(backend)
+        t = time.time()
+        tree = ETU.parsereadonly(data)
+        times[backend] += time.time() - t
+        return tree
+
+    def write(tree, type, params):  # Normalised output from writeXMLobject()
+        item = ETU.xmlitem()
+        item.type = type
+        item.outparams = None
+        item.etree = tree
+        UFO.writeXMLobject(item, params, outdir, "out.xml", False, fobject=True)
+        return UT.readfile(os.path.join(outdir, "out.xml"))
+
+    for fontn in fonts:
+        font = UFO.Ufont(fontn, logger=loggerobj(scrlevel="S"), lazy=True)
+        for (dirn, subdirs, filens) in os.walk(fontn):
+            for filen in sorted(filens):
+                type = os.path.splitext(filen)[1][1:]
+                if type not in ("glif", "plist"): continue
+                fulln = os.path.join(dirn, filen)
+                data = UT.readfile(fulln)
+                (etree, lxtree) = (parse("etree", data), parse("lxml", data))
+                problems = []
+                if ETU.etreetotuple(etree) != ETU.etreetotuple(lxtree):
+                    problems.append("trees differ")
+                elif write(etree, type, font.outparams) != \
+                        write(ETU.tupletoetree(ETU.etreetotuple(lxtree)), type, font.outparams):
+                    problems.append("normalised output differs")
+                if type == "glif":
+                    records = []
+                    for backend in ("etree", "lxml"):
+                        ETU.setreadonlyparser(backend)
+                        records.append(UFO.scanGlif(fulln, font.UFOversion))
+                    if records[0] != records[1]: problems.append("scanGlif() records differ")
+                count += 1
+                if problems:
+                    failures += 1
+                    print(os.path.relpath(fulln, fontn) + ": " + ", ".join(problems))
+
+    shutil.rmtree(tempdir)
+    print("%d files checked in %d fonts, %d with differences" % (count, len(fonts), failures))
+    print("Parse time: cElementTree %.3fs, lxml %.3fs" % (times["etree"], times["lxml"]))
+    if failures: sys.exit(1)
+
+if __name__ == "__main__":
+    main()